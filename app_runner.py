@@ -0,0 +1,366 @@
+import collections
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+
+# ==========================================
+# RUNNING GENERATED APPS
+# ==========================================
+# Runtime verification starts the app and decides as soon as it can. The app is
+# ready when it prints a listening/URL line or its port accepts connections. It
+# failed if it exits non-zero, and it is done if it exits 0. Only if none of
+# that happens within READY_TIMEOUT is it taken to be a quiet long-running
+# process. Output is read line by line into a bounded buffer, so chatty apps
+# can't fill memory and reading never blocks on a pipe after the app is stopped.
+
+READY_TIMEOUT = 10
+SETTLE_TIME = 0.5  # keep watching after readiness to catch crashes right after startup
+POLL_INTERVAL = 0.05
+STOP_TIMEOUT = 3
+MAX_OUTPUT_LINES = 500
+MAX_LINE_CHARS = 2000
+
+URL_PATTERN = re.compile(r"https?://([\w.\-]+|\[[0-9a-f:]+\])(?::(\d+))?[^\s'\"<>]*", re.IGNORECASE)
+READY_PATTERN = re.compile(
+    r"listening|running (?:on|at)|server (?:is )?(?:running|started|ready)|ready in|"
+    r"started server|serving (?:http|on|at)|compiled successfully|\blocal:\s",
+    re.IGNORECASE,
+)
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "0.0.0.0", "[::]", "[::1]")
+
+
+class OutputBuffer:
+    """The last max_lines lines of a process's stdout and stderr, interleaved"""
+
+    def __init__(self, max_lines=MAX_OUTPUT_LINES):
+        self.lines = collections.deque(maxlen=max_lines)
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def append(self, line):
+        with self.lock:
+            if len(self.lines) == self.lines.maxlen:
+                self.dropped += 1
+            self.lines.append(line)
+
+    def text(self):
+        with self.lock:
+            head = f"[... {self.dropped} earlier lines dropped]\n" if self.dropped else ""
+            return head + "".join(self.lines)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def port_open(port, host="127.0.0.1"):
+    try:
+        with socket.create_connection((host, port), timeout=0.2):
+            return True
+    except OSError:
+        return False
+
+
+def _signal_group(process, sig):
+    # npm start, flask --reload etc. run the app in a child; stop the whole group
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, sig)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _stop(process):
+    _signal_group(process, signal.SIGTERM)
+    try:
+        process.wait(timeout=STOP_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        pass
+    _signal_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+    process.wait()
+
+
+def run_app(cmd, cwd, timeout=READY_TIMEOUT, env=None, port=None, wait_ready=True):
+    """Start cmd, watch it until it is ready, exits or timeout passes, then stop it.
+
+    The app gets a free port in $PORT (or the given port). stdin is an open pipe
+    that is never written to, so an interactive prompt just waits. With
+    wait_ready=False (test commands) only exiting ends the run early.
+
+    Returns a dict: status ("ready", "exited", "crashed" or "running"), returncode,
+    url (first local URL the app printed, else the first URL, if any), output (tail of stdout+stderr) and seconds.
+    """
+    port = port or free_port()
+    env = {**os.environ, "PORT": str(port), "PYTHONUNBUFFERED": "1", **(env or {})}
+    output = OutputBuffer()
+    ports = [port]
+    ready = threading.Event()
+    found = {"url": None, "local": False}
+
+    def watch(pipe):
+        for line in iter(lambda: pipe.readline(MAX_LINE_CHARS), ""):
+            output.append(line)
+            url = URL_PATTERN.search(line)
+            local = url is not None and url.group(1).lower() in LOCAL_HOSTS
+            # Only a local URL is the app's own; a remote one (e.g. an API it calls)
+            # is reported as the url until a local one shows up, but isn't readiness
+            if local and not found["local"]:
+                found.update(url=url.group(0), local=True)
+            elif url and not found["url"]:
+                found["url"] = url.group(0)
+            if local and url.group(2):
+                ports.append(int(url.group(2)))
+            if local or READY_PATTERN.search(line):
+                ready.set()
+        pipe.close()
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+        start_new_session=True,
+    )
+    readers = [threading.Thread(target=watch, args=(pipe,), daemon=True) for pipe in (process.stdout, process.stderr)]
+    for reader in readers:
+        reader.start()
+
+    status = "running"
+    try:
+        deadline = start + timeout
+        while time.perf_counter() < deadline and process.poll() is None:
+            if wait_ready and (ready.is_set() or any(port_open(p) for p in list(ports))):
+                status = "ready"
+                settled = time.perf_counter() + SETTLE_TIME
+                while time.perf_counter() < settled and process.poll() is None:
+                    time.sleep(POLL_INTERVAL)
+                break
+            if wait_ready:
+                ready.wait(POLL_INTERVAL)
+            else:
+                time.sleep(POLL_INTERVAL)
+        returncode = process.poll()
+    finally:
+        _stop(process)
+        process.stdin.close()
+        for reader in readers:
+            reader.join(timeout=1)
+
+    if returncode is not None:
+        status = "exited" if returncode == 0 else "crashed"
+    return {
+        "status": status,
+        "returncode": returncode,
+        "url": found["url"],
+        "output": output.text(),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# ==========================================
+# ENTRY POINTS & PARALLEL SANDBOXED RUNS
+# ==========================================
+# A project can have several things worth running: package.json scripts, Python
+# modules with a __main__ block, a test suite. All of them run at once, each in
+# its own temporary copy of the project (so runs can't trip over each other's
+# files or the project itself), with its own $PORT and CPU/memory/file-size
+# limits. Their failures are merged into one report for the fixer.
+
+MAX_COMMANDS = 6
+MAX_PARALLEL = 4
+TEST_TIMEOUT = 120
+REPORT_CHARS_PER_COMMAND = 1500
+
+# Applied to every run (seconds of CPU, bytes). Lowered to the hard limit if that is smaller.
+LIMITS = {"cpu": 120, "memory": 2 * 1024 ** 3, "file_size": 256 * 1024 ** 2}
+
+# Usually the same server under different names; only the first one present is run
+APP_SCRIPTS = ("start", "dev", "serve")
+# Python entry points that are run ahead of other scripts with a __main__ block
+MAIN_SCRIPTS = ("main.py", "app.py")
+SKIP_DIRS = {"node_modules", ".git", "__pycache__", "venv", ".venv", "dist", "build"}
+MAIN_BLOCK = re.compile(r"^if __name__ == ['\"]__main__['\"]\s*:", re.MULTILINE)
+TEST_FILE = re.compile(r"^(test_.*|.*_test)\.py$")
+
+# Sets the limits, then execs the real command (so it is safe to start from threads)
+_LAUNCHER = """import os, resource, sys
+def limit(kind, value):
+    soft, hard = resource.getrlimit(kind)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    resource.setrlimit(kind, (value, hard))
+limit(resource.RLIMIT_CPU, int(sys.argv[1]))
+limit(resource.RLIMIT_DATA, int(sys.argv[2]))
+limit(resource.RLIMIT_FSIZE, int(sys.argv[3]))
+os.execvp(sys.argv[4], sys.argv[4:])
+"""
+
+
+def _command(name, cmd, kind, ok_codes=(0,)):
+    return {"name": name, "cmd": cmd, "kind": kind, "ok_codes": ok_codes}
+
+
+def _walk_files(project):
+    for root, dirs, files in os.walk(project):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.startswith(".")]
+        for name in files:
+            yield os.path.relpath(os.path.join(root, name), project)
+
+
+def _has_module(python, module):
+    # Not cached: a later round's dependency install may add the module
+    try:
+        return subprocess.run([python, "-c", f"import {module}"], capture_output=True, timeout=30).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+def _node_commands(project):
+    try:
+        with open(os.path.join(project, "package.json"), encoding="utf-8") as f:
+            package = json.load(f)
+    except (OSError, ValueError):
+        package = {}
+    scripts = package.get("scripts") or {}
+    commands = [_command(f"npm run {name}", ["npm", "run", name], "app") for name in APP_SCRIPTS if name in scripts][:1]
+    if not commands:
+        # npm start falls back to server.js; otherwise run the package's main file
+        if os.path.isfile(os.path.join(project, "server.js")):
+            commands.append(_command("npm start", ["npm", "start"], "app"))
+        else:
+            main = package.get("main") or "index.js"
+            if os.path.isfile(os.path.join(project, main)):
+                commands.append(_command(f"node {main}", ["node", main], "app"))
+    test = scripts.get("test", "")
+    if test and "no test specified" not in test:
+        commands.append(_command("npm test", ["npm", "test"], "test"))
+    return commands
+
+
+def _python_commands(project, python):
+    files = sorted(_walk_files(project))
+    entries, tests = [], False
+    for path in files:
+        name = os.path.basename(path)
+        if not path.endswith(".py") or name == "setup.py":
+            continue
+        if TEST_FILE.match(name):
+            tests = True
+            continue
+        if name == "__main__.py":
+            package = os.path.dirname(path)
+            if package:
+                module = package.replace(os.sep, ".")
+                entries.append(((0, path.count(os.sep), path), _command(f"python -m {module}", [python, "-m", module], "app")))
+            continue
+        try:
+            with open(os.path.join(project, path), encoding="utf-8", errors="replace") as f:
+                has_main = MAIN_BLOCK.search(f.read())
+        except OSError:
+            continue
+        if has_main or path in MAIN_SCRIPTS:
+            # main.py/app.py and packages first, so helper scripts can't crowd them out of MAX_COMMANDS
+            rank = 0 if name in MAIN_SCRIPTS else 1
+            entries.append(((rank, path.count(os.sep), path), _command(f"python {path}", [python, path], "app")))
+    entries = [command for _, command in sorted(entries, key=lambda entry: entry[0])]
+    if not entries and not tests:
+        # No obvious entry point: fall back to the first top-level script
+        top = [path for path in files if path.endswith(".py") and os.sep not in path]
+        if top:
+            entries.append(_command(f"python {top[0]}", [python, top[0]], "app"))
+    commands = entries
+    if tests and _has_module(python, "pytest"):
+        # Exit code 5 = no tests collected
+        commands.append(_command("pytest", [python, "-m", "pytest", "-q", "-p", "no:cacheprovider"], "test", (0, 5)))
+    return commands
+
+
+def find_commands(project, python="python3"):
+    """Everything worth running in project: app entry points first, then test commands"""
+    commands = []
+    if os.path.isfile(os.path.join(project, "package.json")):
+        commands += _node_commands(project)
+    if any(path.endswith(".py") for path in _walk_files(project)):
+        commands += _python_commands(project, python)
+    apps = [c for c in commands if c["kind"] == "app"]
+    tests = [c for c in commands if c["kind"] == "test"]
+    return (apps[:MAX_COMMANDS - len(tests)] + tests)[:MAX_COMMANDS]
+
+
+def _with_limits(cmd):
+    if os.name != "posix":
+        # The resource module (and rlimits) are POSIX-only
+        return cmd
+    return [sys.executable, "-c", _LAUNCHER, str(LIMITS["cpu"]), str(LIMITS["memory"]), str(LIMITS["file_size"]), *cmd]
+
+
+def _copy_project(project, workdir):
+    shutil.copytree(project, workdir, symlinks=True, ignore=shutil.ignore_patterns("node_modules", ".git", "__pycache__"))
+    modules = os.path.join(project, "node_modules")
+    if os.path.isdir(modules):
+        # Dependencies are only read; share them instead of copying
+        os.symlink(os.path.abspath(modules), os.path.join(workdir, "node_modules"), target_is_directory=True)
+
+
+def run_sandboxed(project, command):
+    """Run one command from find_commands in a temporary copy of project"""
+    with tracing.span("runtime.run", command=command["name"], kind=command["kind"]) as span:
+        with tempfile.TemporaryDirectory(prefix="synq-run-") as tmp:
+            workdir = os.path.join(tmp, os.path.basename(os.path.abspath(project)))
+            _copy_project(project, workdir)
+            if command["kind"] == "app":
+                result = run_app(_with_limits(command["cmd"]), workdir)
+            else:
+                result = run_app(_with_limits(command["cmd"]), workdir, timeout=TEST_TIMEOUT, wait_ready=False)
+            # Report paths relative to the project, not the sandbox
+            result["output"] = result["output"].replace(workdir + os.sep, "")
+        if command["kind"] == "app":
+            result["ok"] = result["status"] != "crashed"
+        else:
+            result["ok"] = result["returncode"] in command["ok_codes"]
+            if result["status"] == "running":
+                result["status"] = "timeout"
+            elif result["status"] == "crashed":
+                result["status"] = "failed"
+        span.set(status=result["status"], ok=result["ok"])
+    return {**command, **result}
+
+
+def run_all(project, commands):
+    """Run commands in parallel, each in its own sandbox. Results are in command order."""
+    if not commands:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL, len(commands))) as pool:
+        return list(pool.map(tracing.bind(lambda command: run_sandboxed(project, command)), commands))
+
+
+def failure_report(results):
+    """One report covering every failed run, for the fixer prompt"""
+    sections = []
+    for r in results:
+        if r["ok"]:
+            continue
+        code = f"exit code {r['returncode']}" if r["returncode"] is not None else f"no exit within {r['seconds']:.0f}s"
+        output = r["output"].strip()[-REPORT_CHARS_PER_COMMAND:] or "(no output)"
+        sections.append(f"$ {r['name']}  [{r['kind']}: {r['status']}, {code}]\n{output}")
+    return "\n\n".join(sections)
@@ -0,0 +1,166 @@
+"""Non-interactive batch runner: push a JSONL file of prompts through a SYNQ mode.
+
+Usage:
+    python batch_runner.py prompts.jsonl results.jsonl --mode consensus --workers 8
+
+Each input line is a JSON object. The prompt is read from --prompt-field (default
+"prompt"), the id from "id" / "request_id" (falls back to the line number), and a
+per-line "mode" overrides --mode. Results are appended to the output JSONL as they
+finish. Re-running with the same output file skips prompts that already succeeded,
+so an interrupted run can be resumed.
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import model_interface as models
+import tracing
+
+BATCH_MODES = ("consensus", "debate", "discussion", "voting")
+
+
+def load_v3():
+    """The v3-multi-mode.py module (also used by benchmark.py)"""
+    # v3-multi-mode.py is a script with a hyphenated name, so import it by path
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "v3-multi-mode.py")
+    spec = importlib.util.spec_from_file_location("synq_modes", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_modes():
+    module = load_v3()
+    return {name: getattr(module, f"mode_{name}") for name in BATCH_MODES}
+
+
+def read_prompts(path, prompt_field="prompt"):
+    """Yield (id, prompt, mode or None) from a JSONL file, skipping blank and malformed lines"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"⚠️ {path}:{line_no}: skipping invalid JSON ({e})", file=sys.stderr)
+                continue
+            if not isinstance(record, dict):
+                print(f"⚠️ {path}:{line_no}: skipping line that is not a JSON object", file=sys.stderr)
+                continue
+            prompt = record.get(prompt_field)
+            if prompt is None and prompt_field == "prompt":
+                # Backlog-style records carry a title and body instead of a prompt
+                prompt = "\n\n".join(part for part in (record.get("title"), record.get("body")) if part)
+            item_id = str(record.get("id") or record.get("request_id") or line_no)
+            yield item_id, prompt, record.get("mode")
+
+
+def completed_ids(path):
+    """Ids already written successfully to an earlier (possibly interrupted) run"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a half-written last line; that prompt is simply re-run
+                continue
+            if isinstance(record, dict) and record.get("status") == "ok" and "id" in record:
+                done.add(record["id"])
+    return done
+
+
+def run_one(modes, item_id, prompt, mode):
+    start = time.perf_counter()
+    try:
+        with tracing.span(f"mode.{mode}", item=item_id):
+            result = modes[mode](prompt)
+        record = {"id": item_id, "mode": mode, "status": "ok", "prompt": prompt,
+                  "result": result, "elapsed": time.perf_counter() - start}
+        if not result.get("ok", True):
+            # The modes turn provider failures into text; don't let resume skip them
+            record.update(status="error", error="provider calls failed (see result)")
+        return record
+    except Exception as e:
+        return {"id": item_id, "mode": mode, "status": "error", "prompt": prompt,
+                "error": f"{e}\n{traceback.format_exc()}", "elapsed": time.perf_counter() - start}
+
+
+def run_batch(input_path, output_path, mode="consensus", workers=4, prompt_field="prompt"):
+    modes = load_modes()
+    done = completed_ids(output_path)
+    pending = []
+    for item_id, prompt, line_mode in read_prompts(input_path, prompt_field):
+        if item_id in done:
+            continue
+        item_mode = line_mode or mode
+        if item_mode not in modes:
+            print(f"⚠️ Skipping {item_id}: unknown mode '{item_mode}'", file=sys.stderr)
+            continue
+        if not prompt:
+            print(f"⚠️ Skipping {item_id}: no prompt", file=sys.stderr)
+            continue
+        pending.append((item_id, prompt, item_mode))
+
+    print(f"📋 {len(pending)} prompts to run ({len(done)} already done), {workers} workers", file=sys.stderr)
+    if not pending:
+        return
+
+    write_lock = threading.Lock()
+    ok = failed = 0
+    batch_start = time.perf_counter()
+    trace_since = tracing.mark()
+
+    # The modes print their usual terminal output; in a batch that is just noise.
+    with open(output_path, "a", encoding="utf-8") as out, \
+            open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_one, modes, *item) for item in pending]
+            for count, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                with write_lock:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                    os.fsync(out.fileno())
+                if record["status"] == "ok":
+                    ok += 1
+                else:
+                    failed += 1
+                print(f"  [{count}/{len(pending)}] {record['id']} {record['status']} ({record['elapsed']:.1f}s)", file=sys.stderr)
+
+    elapsed = time.perf_counter() - batch_start
+    print(f"✅ Batch complete: {ok} ok, {failed} failed in {elapsed:.1f}s "
+          f"({len(pending) / elapsed:.2f} prompts/s)", file=sys.stderr)
+    print(tracing.summary(trace_since), file=sys.stderr)
+    paths = tracing.save("batch", trace_since)
+    if paths:
+        print(f"   Trace: {paths[0]}, {paths[1]}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through a SYNQ mode.")
+    parser.add_argument("input", help="JSONL file with one prompt per line")
+    parser.add_argument("output", help="JSONL file to append results to (also used to resume)")
+    parser.add_argument("--mode", default="consensus", choices=BATCH_MODES)
+    parser.add_argument("--workers", type=int, default=4, help="prompts to run at once")
+    parser.add_argument("--prompt-field", default="prompt", help="JSON key holding the prompt text")
+    args = parser.parse_args()
+
+    run_batch(args.input, args.output, args.mode, args.workers, args.prompt_field)
+    if models.cache_stats():
+        print(f"   Cache: {models.cache_stats()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Offline benchmarks: run the modes against the local stub server and time them.
+
+Usage:
+    python benchmark.py                                # every scenario, 3 runs each
+    python benchmark.py --modes consensus,team --runs 5 --concurrency 4
+    python benchmark.py --error-rate 0.1 --latency-scale 2
+    python benchmark.py --save bench.json              # record results
+    python benchmark.py --baseline bench.json          # exit 1 on a regression
+    python benchmark.py --strip                        # markdown stripper throughput only
+
+No API keys or network access are needed: providers are pointed at stub_server,
+rate limits are lifted and the response cache is off, so the numbers measure the
+orchestration itself (fan-out, streaming, retries, QA/fix loops) over a known
+latency profile.
+"""
+import argparse
+import builtins
+import contextlib
+import json
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import batch_runner
+import markdown_strip
+import model_interface as models
+import provider_registry as registry
+import provider_router
+import rate_limiter
+import stub_server
+import tracing
+
+SCENARIOS = ("consensus", "debate", "discussion", "voting", "team")
+REGRESSION_TOLERANCE = 0.15
+
+PROMPT = "Should cities replace parking minimums with congestion pricing?"
+TEAM_PROMPT = "Create a landing page for a coffee roastery"
+
+
+def point_at(server):
+    """Send every provider call to the stub server and lift client-side limits"""
+    registry.load(builtin_only=True)
+    registry.register("gemini", url=f"{server.url}/gemini", api_key="stub")
+    registry.register("groq", url=f"{server.url}/groq/chat/completions", api_key="stub")
+    registry.register("openrouter", url=f"{server.url}/openrouter/chat/completions", api_key="stub")
+    models.disable_cache()
+    for provider in registry.names():
+        rate_limiter.configure(provider, rpm=1_000_000, tpm=1_000_000_000)
+
+
+class ScriptedInput:
+    """Answers the team-coding prompts: a fresh project directory, then 'exit'"""
+
+    def __init__(self, root):
+        self.root = root
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt=""):
+        if "name for your project" in prompt:
+            with self.lock:
+                self.count += 1
+                return os.path.join(self.root, f"project-{self.count}")
+        return "exit"
+
+
+def scenario_runner(v3, name):
+    if name == "team":
+        return lambda: v3.mode_team_coding(TEAM_PROMPT, "1")
+    mode = getattr(v3, f"mode_{name}")
+    return lambda: mode(PROMPT)
+
+
+def run_scenario(v3, server, name, runs, concurrency):
+    run = scenario_runner(v3, name)
+    provider_router._health.clear()
+    server.reset_stats()
+    since = tracing.mark()
+    durations = []
+
+    def timed(_):
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed, range(runs)))
+    wall = time.perf_counter() - wall_start
+
+    stats = server.snapshot()
+    calls = sum(s["requests"] for s in stats.values())
+    errors = sum(s["errors"] for s in stats.values())
+    llm_spans = [s for s in tracing.spans(since) if s.category == "llm"]
+    return {
+        "scenario": name,
+        "runs": runs,
+        "concurrency": concurrency,
+        "wall": wall,
+        "mean": statistics.mean(durations),
+        "p50": statistics.median(durations),
+        "min": min(durations),
+        "max": max(durations),
+        "calls_per_run": calls / runs,
+        "errors": errors,
+        "retries": sum(s.attrs.get("retries", 0) for s in llm_spans),
+        "calls_per_s": calls / wall,
+        "runs_per_min": runs / wall * 60,
+        "by_provider": stats,
+    }
+
+
+# ==========================================
+# MARKDOWN STRIPPING
+# ==========================================
+STRIP_SIZES = (100_000, 1_000_000)
+STREAM_CHUNK = 20  # characters per streamed chunk, about what the providers send
+
+
+def legacy_strip_markdown(text):
+    """The multi-pass stripper markdown_strip replaced, kept for comparison"""
+    text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
+    text = re.sub(r'__(.+?)__', r'\1', text)
+    text = re.sub(r'\*(.+?)\*', r'\1', text)
+    text = re.sub(r'_(.+?)_', r'\1', text)
+    text = re.sub(r'```[\w]*\n', '', text)
+    text = re.sub(r'```', '', text)
+    text = re.sub(r'`(.+?)`', r'\1', text)
+    text = re.sub(r'^#{1,6}\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\[(.+?)\]\(.+?\)', r'\1', text)
+    return text
+
+
+def markdown_sample(chars):
+    """A model-style answer: headers, emphasis, links, lists and fenced code"""
+    section = (
+        "## Design notes\n\n"
+        + stub_server.filler(600, seed=5) + "\n\n"
+        + "- **Latency** matters more than _throughput_ here; see [the docs](https://example.com/docs).\n"
+        + "- Use `snake_case_names` and keep `__init__` small.\n"
+        + "- Outside code too: keep __init__ small, export via __all__, and use snake_case_names.\n\n"
+        + "```python\ndef handler(*args, **kwargs):\n    # keep **kwargs intact\n    return my_value_1 * 2\n```\n\n"
+    )
+    return (section * (chars // len(section) + 1))[:chars]
+
+
+def _throughput(fn, text, repeat=3):
+    best = min(_timed(fn, text) for _ in range(repeat))
+    return len(text) / best / 1e6
+
+
+def _timed(fn, text):
+    start = time.perf_counter()
+    fn(text)
+    return time.perf_counter() - start
+
+
+def _stream_new(text):
+    stripper = markdown_strip.MarkdownStripper()
+    out = [stripper.feed(text[i:i + STREAM_CHUNK]) for i in range(0, len(text), STREAM_CHUNK)]
+    out.append(stripper.flush())
+    return "".join(out)
+
+
+def _stream_legacy(text):
+    # What stream_response did before: buffer, then clean each completed block of lines
+    pending, out = "", []
+    for i in range(0, len(text), STREAM_CHUNK):
+        pending += text[i:i + STREAM_CHUNK]
+        if "\n" in pending:
+            lines, pending = pending.rsplit("\n", 1)
+            out.append(legacy_strip_markdown(lines) + "\n")
+    out.append(legacy_strip_markdown(pending))
+    return "".join(out)
+
+
+def run_strip_benchmark():
+    print(f"{'INPUT':<10}{'STRIPPER':<12}{'BATCH MB/s':>12}{'STREAM MB/s':>13}")
+    for size in STRIP_SIZES:
+        text = markdown_sample(size)
+        assert _stream_new(text) == markdown_strip.strip_markdown(text)
+        assert "keep __init__ small, export via __all__, and use snake_case_names" in markdown_strip.strip_markdown(text)
+        for name, batch, stream in (
+            ("legacy", legacy_strip_markdown, _stream_legacy),
+            ("one-pass", markdown_strip.strip_markdown, _stream_new),
+        ):
+            print(f"{size // 1000:>6} KB  {name:<12}{_throughput(batch, text):>12.1f}{_throughput(stream, text):>13.1f}")
+
+
+def print_table(results, baseline=None):
+    print(f"{'SCENARIO':<12}{'RUNS':>6}{'MEAN s':>9}{'P50 s':>9}{'MAX s':>9}{'CALLS/RUN':>11}{'ERRORS':>8}{'RETRIES':>9}{'CALLS/s':>9}{'RUNS/min':>10}  vs BASELINE")
+    for r in results:
+        line = (f"{r['scenario']:<12}{r['runs']:>6}{r['mean']:>9.2f}{r['p50']:>9.2f}{r['max']:>9.2f}"
+                f"{r['calls_per_run']:>11.1f}{r['errors']:>8}{r['retries']:>9}{r['calls_per_s']:>9.2f}{r['runs_per_min']:>10.1f}")
+        old = (baseline or {}).get(r["scenario"])
+        if old:
+            change = r["mean"] / old["mean"] - 1
+            line += f"  {change:+.0%}{'  ⚠️ REGRESSION' if change > REGRESSION_TOLERANCE else ''}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SYNQ modes against a local stub server.")
+    parser.add_argument("--modes", default=",".join(SCENARIOS), help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1, help="runs of a scenario in flight at once")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply every provider's stub latency")
+    parser.add_argument("--jitter", type=float, help="log-normal sigma of stub latency")
+    parser.add_argument("--chars", type=int, help="size of free-text replies")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--stream-chunks", type=int)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare with a JSON file from --save; exit 1 on a regression")
+    parser.add_argument("--strip", action="store_true", help="only benchmark markdown stripping (no stub server)")
+    args = parser.parse_args()
+
+    if args.strip:
+        run_strip_benchmark()
+        return
+
+    names = [name.strip() for name in args.modes.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    server = stub_server.start(seed=args.seed)
+    for provider, profile in server.profiles.items():
+        profile["latency"] *= args.latency_scale
+    server.configure(error_rate=args.error_rate, error_status=args.error_status)
+    for key in ("jitter", "chars", "stream_chunks"):
+        if getattr(args, key) is not None:
+            server.configure(**{key: getattr(args, key)})
+    point_at(server)
+    v3 = batch_runner.load_v3()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+
+    workdir = tempfile.mkdtemp(prefix="synq-bench-")
+    original_input = builtins.input
+    builtins.input = ScriptedInput(workdir)
+    results = []
+    try:
+        for name in names:
+            print(f"⏱️  {name}: {args.runs} runs, {args.concurrency} at a time...", file=sys.stderr)
+            results.append(run_scenario(v3, server, name, args.runs, args.concurrency))
+    finally:
+        builtins.input = original_input
+        shutil.rmtree(workdir, ignore_errors=True)
+        server.stop()
+
+    print()
+    print_table(results, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"\nResults saved to {args.save}")
+    if baseline and any(
+        r["scenario"] in baseline and r["mean"] / baseline[r["scenario"]]["mean"] - 1 > REGRESSION_TOLERANCE
+        for r in results
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
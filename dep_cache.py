@@ -0,0 +1,232 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: builds are only serialized within this process
+    fcntl = None
+
+# ==========================================
+# DEPENDENCY CACHE
+# ==========================================
+# Installs are keyed on a hash of the project's manifests, so a project
+# whose manifest was seen before reuses the result instead of installing again:
+#   node:   package.json + lockfile -> a node_modules tree, hard-linked into the project
+#   python: requirements.txt        -> a virtualenv, used in place via its interpreter
+# Entries are built at their final path (virtualenvs hard-code it in their
+# scripts, so they can't be moved) under a per-key lock, and only count once a
+# COMPLETE file is written, so a half-finished install is never used. npm and pip run against their local package caches first;
+# with SYNQ_OFFLINE=1 they don't touch the network at all (pip then needs a
+# wheelhouse: SYNQ_WHEELHOUSE=<dir of wheels>).
+
+CACHE_DIR = os.environ.get("SYNQ_DEP_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "synq", "deps")
+OFFLINE = os.environ.get("SYNQ_OFFLINE") == "1"
+WHEELHOUSE = os.environ.get("SYNQ_WHEELHOUSE")
+INSTALL_TIMEOUT = 300
+MAX_ENTRIES = 20
+
+NODE_MANIFESTS = ("package.json", "package-lock.json", "npm-shrinkwrap.json")
+PYTHON_MANIFESTS = ("requirements.txt",)
+# Written into a project's node_modules so later rounds can tell it is ours and current
+MARKER = ".synq-deps"
+# Written into a cache entry once its install finished
+COMPLETE = ".synq-complete"
+
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+# Keys whose install failed in this process, with the error; not retried until the manifest changes
+_failed = {}
+# Keys used by this process (linked into a project or running a venv); never pruned
+_in_use = set()
+
+
+def manifest_hash(project, names, salt=""):
+    """Hash of the manifests that exist in project, or None if there are none"""
+    digest = hashlib.sha256(f"{sys.platform}\0{salt}\0".encode())
+    found = False
+    for name in names:
+        path = os.path.join(project, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                digest.update(name.encode() + b"\0" + f.read() + b"\0")
+            found = True
+    return digest.hexdigest()[:20] if found else None
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Different filesystem, or links not allowed
+        shutil.copy2(src, dst)
+
+
+def _lock_for(key):
+    with _build_locks_lock:
+        return _build_locks.setdefault(key, threading.Lock())
+
+
+def _prune():
+    entries = [os.path.join(CACHE_DIR, name) for name in os.listdir(CACHE_DIR) if not name.startswith(".")]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    now = time.time()
+    for path in entries[MAX_ENTRIES:]:
+        if os.path.basename(path) in _in_use:
+            continue
+        if not os.path.isfile(os.path.join(path, COMPLETE)) and now - os.path.getmtime(path) < INSTALL_TIMEOUT:
+            # Probably still being built by another process
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class _FileLock:
+    """Exclusive lock on CACHE_DIR/.<key>.lock, so processes sharing the cache don't build the same entry twice"""
+
+    def __init__(self, key):
+        self.path = os.path.join(CACHE_DIR, f".{key}.lock")
+
+    def __enter__(self):
+        self.file = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+
+def _entry(key, manifests, project, install):
+    """Path of the cache entry for key, building it with install(path) on a miss.
+
+    Returns (path, hit).
+    """
+    path = os.path.join(CACHE_DIR, key)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with _lock_for(key), _FileLock(key):
+        _in_use.add(key)
+        if os.path.isfile(os.path.join(path, COMPLETE)):
+            os.utime(path)
+            return path, True
+        if key in _failed:
+            raise RuntimeError(_failed[key])
+        # Left over from an interrupted build (or an older cache layout)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        try:
+            for name in manifests:
+                if os.path.isfile(os.path.join(project, name)):
+                    shutil.copy2(os.path.join(project, name), path)
+            install(path)
+            with open(os.path.join(path, COMPLETE), "w"):
+                pass
+        except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+            _failed[key] = str(e)
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        _prune()
+        return path, False
+
+
+def _install(cmd, cwd):
+    result = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, timeout=INSTALL_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError((result.stderr or result.stdout).strip()[-2000:])
+
+
+def _npm_install(path):
+    flags = ["--no-audit", "--no-fund", "--offline" if OFFLINE else "--prefer-offline"]
+    has_lock = any(os.path.isfile(os.path.join(path, name)) for name in NODE_MANIFESTS[1:])
+    try:
+        _install(["npm", "ci" if has_lock else "install", *flags], path)
+    except RuntimeError:
+        if not has_lock:
+            raise
+        # Generated lockfiles are often out of sync with package.json, which npm ci
+        # refuses; npm install resolves package.json and rewrites the lockfile
+        shutil.rmtree(os.path.join(path, "node_modules"), ignore_errors=True)
+        _install(["npm", "install", *flags], path)
+    os.makedirs(os.path.join(path, "node_modules"), exist_ok=True)
+
+
+def _venv_python(venv):
+    return os.path.join(venv, "Scripts", "python.exe") if os.name == "nt" else os.path.join(venv, "bin", "python")
+
+
+def _pip_install(path):
+    venv = os.path.join(path, "venv")
+    _install([sys.executable, "-m", "venv", venv], path)
+    cmd = [_venv_python(venv), "-m", "pip", "install", "--disable-pip-version-check", "-q", "-r", "requirements.txt"]
+    if WHEELHOUSE:
+        cmd += ["--find-links", WHEELHOUSE]
+    if OFFLINE:
+        cmd.append("--no-index")
+    _install(cmd, path)
+
+
+def _result(state, start, **extra):
+    return {"state": state, "seconds": time.perf_counter() - start, "error": None, **extra}
+
+
+def prepare_node(project):
+    """Make project/node_modules match package.json (and the lockfile).
+
+    state is "none" (no package.json), "own" (node_modules we didn't create; left
+    alone), "unchanged", "hit" (linked from the cache), "installed" or "failed".
+    """
+    start = time.perf_counter()
+    key = manifest_hash(project, NODE_MANIFESTS)
+    if key is None:
+        return _result("none", start)
+    key = f"node-{key}"
+    target = os.path.join(project, "node_modules")
+    marker = os.path.join(target, MARKER)
+    if os.path.isdir(target):
+        if not os.path.isfile(marker):
+            return _result("own", start)
+        with open(marker) as f:
+            if f.read().strip() == key:
+                return _result("unchanged", start)
+
+    try:
+        path, hit = _entry(key, NODE_MANIFESTS, project, _npm_install)
+    except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+        return _result("failed", start, error=str(e))
+    try:
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.copytree(os.path.join(path, "node_modules"), target, symlinks=True, copy_function=_link_or_copy)
+    except OSError:
+        # e.g. out of disk space half way through the copy: install into the project directly
+        shutil.rmtree(target, ignore_errors=True)
+        try:
+            _npm_install(project)
+        except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+            return _result("failed", start, error=str(e))
+        hit = False
+    with open(marker, "w") as f:
+        f.write(key)
+    return _result("hit" if hit else "installed", start)
+
+
+def prepare_python(project):
+    """A virtualenv with project's requirements.txt installed.
+
+    Returns the same states as prepare_node (except "own"/"unchanged"), plus
+    "python": the venv's interpreter, or None when there is nothing to install or
+    the install failed.
+    """
+    start = time.perf_counter()
+    version = ".".join(map(str, sys.version_info[:2]))
+    key = manifest_hash(project, PYTHON_MANIFESTS, salt=sys.executable + version)
+    if key is None:
+        return _result("none", start, python=None)
+    try:
+        path, hit = _entry(f"python-{key}", PYTHON_MANIFESTS, project, _pip_install)
+    except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+        return _result("failed", start, python=None, error=str(e))
+    return _result("hit" if hit else "installed", start, python=_venv_python(os.path.join(path, "venv")))
@@ -0,0 +1,145 @@
+import json
+import re
+
+# ==========================================
+# JSON EXTRACTION
+# ==========================================
+# Models wrap the JSON we ask for in markdown fences, add a sentence before or
+# after it, or put raw newlines inside strings. Instead of stripping fences and
+# hoping, scan for the first balanced {...} (or [...]) that parses and has the
+# expected shape. Strings are skipped as whole tokens, so braces and ``` inside
+# generated code don't confuse the scan.
+
+# A complete string literal, or a bracket. Unterminated strings fall through and
+# their brackets are counted; json.loads has the final say anyway.
+_TOKENS = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]', re.DOTALL)
+
+REPAIR_PROMPT = """The text below was supposed to be a single valid JSON {kind}, but it could not be used: {error}.
+Return ONLY the corrected JSON {kind} with the same content. No markdown, no explanation.
+{shape}
+TEXT:
+{text}"""
+
+# Longest text included in a repair prompt; the candidate JSON is usually much shorter
+REPAIR_MAX_CHARS = 12000
+
+
+def _balanced_end(text, start):
+    """Index just past the bracketed value opening at start, or None if it never closes"""
+    depth = 0
+    for match in _TOKENS.finditer(text, start):
+        token = match.group()
+        if token[0] == '"':
+            continue
+        depth += 1 if token in "{[" else -1
+        if depth == 0:
+            return match.end()
+    return None
+
+
+def _loads(text):
+    # strict=False accepts raw newlines/tabs inside strings, which models emit in code
+    return json.loads(text, strict=False)
+
+
+def _check(value, expect, require):
+    """None if value has the expected type and keys, else what is wrong with it"""
+    if not isinstance(value, expect):
+        return f"expected a JSON {_kind(expect)}, got {type(value).__name__}"
+    missing = [key for key in require if key not in value]
+    if missing:
+        return f"missing key(s) {', '.join(missing)}"
+    return None
+
+
+def _kind(expect):
+    return "array" if expect is list else "object"
+
+
+def locate(text, expect=dict, require=()):
+    """Find the JSON value in a model response.
+
+    Returns (value, (start, end)) for the first balanced block that parses and has
+    the expected type and keys. If none does, returns (None, span) with the span of
+    the first balanced block (the best candidate for a repair), or (None, None).
+    """
+    text = text or ""
+    opener = "[" if expect is list else "{"
+    stripped = text.strip()
+    if stripped.startswith(opener):
+        try:
+            value = _loads(stripped)
+            if _check(value, expect, require) is None:
+                start = text.index(opener)
+                return value, (start, start + len(stripped))
+        except ValueError:
+            pass
+
+    candidate = None
+    pos = text.find(opener)
+    while pos != -1:
+        end = _balanced_end(text, pos)
+        if end is None:
+            # Never closes (e.g. a truncated response); nothing later can either
+            return None, candidate or (pos, len(text))
+        try:
+            value = _loads(text[pos:end])
+            if _check(value, expect, require) is None:
+                return value, (pos, end)
+        except ValueError:
+            pass
+        candidate = candidate or (pos, end)
+        # Skip the whole block: anything nested in it is part of the broken value
+        pos = text.find(opener, end)
+    return None, candidate
+
+
+def document(text):
+    """The JSON text of a generated .json file, or None if there is none.
+
+    A reply that parses as a whole is kept as it is, whatever its top-level
+    value; otherwise the first object or array that parses (in order of where
+    they start) is cut out of the surrounding prose.
+    """
+    stripped = (text or "").strip()
+    try:
+        _loads(stripped)
+        return stripped
+    except ValueError:
+        pass
+    starts = {dict: stripped.find("{"), list: stripped.find("[")}
+    for expect in sorted(starts, key=starts.get):
+        if starts[expect] == -1:
+            continue
+        value, span = locate(stripped, expect)
+        if value is not None:
+            return stripped[span[0]:span[1]]
+    return None
+
+
+def parse(text, expect=dict, require=()):
+    """Returns (value, None) or (None, reason it could not be extracted)"""
+    value, span = locate(text, expect, require)
+    if value is not None:
+        return value, None
+    if span is None:
+        return None, f"no JSON {_kind(expect)} found"
+    try:
+        return None, _check(_loads(text[span[0]:span[1]]), expect, require)
+    except ValueError as e:
+        return None, f"invalid JSON ({e})"
+
+
+def repair_prompt(text, error, expect=dict, require=(), schema=None):
+    """A short prompt asking a model to turn a broken response into valid JSON"""
+    _, span = locate(text, expect, require)
+    if span is not None:
+        text = text[span[0]:span[1]]
+    if len(text) > REPAIR_MAX_CHARS:
+        text = text[:REPAIR_MAX_CHARS] + "\n[...truncated]"
+    shape = ""
+    if schema:
+        shape = f"It must match this JSON schema:\n{json.dumps(schema)}\n"
+    elif require:
+        shape = f"It must have the keys: {', '.join(require)}.\n"
+    return REPAIR_PROMPT.format(kind=_kind(expect), error=error, shape=shape, text=text)
@@ -0,0 +1,120 @@
+import re
+
+# ==========================================
+# MARKDOWN STRIPPING (for clean terminal output)
+# ==========================================
+# One precompiled pattern, one left-to-right pass. Each construct is an
+# alternative; the first one that matches at a position wins, and the text it
+# consumed is never looked at again. That is what keeps code intact: a fenced
+# block or `inline code` is matched as a whole, so the emphasis/header rules
+# never see the `**kwargs` or `# comment` inside it.
+#
+# Every alternative starts with a literal character (line-level constructs with
+# the newline before them, which is why the text is scanned with a "\n" in
+# front), so the regex engine can skip plain text without trying each rule at
+# every position.
+#
+# Emphasis follows CommonMark's intraword rule for underscores, so snake_case_names
+# are left alone and _this_ is stripped. Unlike CommonMark, a bare __dunder__
+# identifier (only word characters between the pairs) is not treated as bold.
+
+_BLOCK = r"""
+    \n[ \t]*```[^`\n]*$(?P<fence>(?s:.*?))(?:\n[ \t]*```[ \t]*$|\Z)
+  | \n(?P<header>[ \t]{0,3}\#{1,6}[ \t]+)
+"""
+_INLINE = r"""
+    `(?P<ticks>`*)(?P<code>.+?)`(?P=ticks)
+  | !\[(?P<image>[^\]\n]*)\]\([^)\n]*\)
+  | \[(?P<link>[^\]\n]+)\]\([^)\n]*\)
+  | \*\*(?P<bold>(?!\s).+?(?<!\s))\*\*
+  | \*(?P<italic>(?![\s*]).*?(?<![\s*\\]))\*
+  | _(?<!\w_)_(?!\w+__(?!\w))(?P<ubold>(?!\s).+?(?<!\s))__(?!\w)
+  | _(?<!\w_)(?P<uitalic>(?![\s_]).*?(?<!\s))_(?!\w)
+"""
+
+TOKEN_PATTERN = re.compile(_BLOCK + "|" + _INLINE, re.MULTILINE | re.VERBOSE)
+INLINE_PATTERN = re.compile(_INLINE, re.MULTILINE | re.VERBOSE)
+FENCE_OPEN = re.compile(r"\n[ \t]*```[^`\n]*$", re.MULTILINE)
+FENCE_CLOSE = re.compile(r"\n[ \t]*```[ \t]*$", re.MULTILINE)
+
+# Constructs whose text is shown as-is; the rest may contain further markup
+# (e.g. a link inside bold)
+_VERBATIM = ("fence", "code")
+
+
+def _replace(match):
+    kind = match.lastgroup
+    if kind == "header":
+        return "\n"
+    text = match.group(kind)
+    if kind in _VERBATIM or not text:
+        return text
+    return INLINE_PATTERN.sub(_replace, text)
+
+
+def strip_markdown(text):
+    """Remove markdown formatting for clean terminal output"""
+    return TOKEN_PATTERN.sub(_replace, "\n" + text)[1:]
+
+
+class MarkdownStripper:
+    """Incremental strip_markdown for streamed text.
+
+    feed() takes chunks as they arrive and returns the cleaned text of every line
+    completed so far; the unfinished last line is held back (a marker may be split
+    across chunks) and returned by flush(). Each line is scanned once, so the cost
+    is linear in the stream length however it is chunked, and the joined output
+    is identical to strip_markdown() on the whole text.
+
+    Lines are emitted with the newline in front of them rather than after, so the
+    newline that ends a line only appears once the next one arrives.
+    """
+
+    def __init__(self):
+        self.pending = []
+        self.in_fence = False
+        self.first = True
+
+    def feed(self, chunk):
+        if "\n" not in chunk:
+            self.pending.append(chunk)
+            return ""
+        head, tail = chunk.rsplit("\n", 1)
+        self.pending.append(head)
+        lines = "".join(self.pending)
+        self.pending = [tail]
+        return self._emit(lines)
+
+    def flush(self):
+        """Return the rest of the text and reset for a new stream"""
+        out = self._emit("".join(self.pending))
+        self.__init__()
+        return out
+
+    def _emit(self, lines):
+        out = self._strip("\n" + lines)
+        if self.first and out:
+            out, self.first = out[1:], False
+        return out
+
+    def _strip(self, text):
+        # Same result as TOKEN_PATTERN over the whole stream: fences are tracked
+        # across calls, everything between them goes through TOKEN_PATTERN
+        out = []
+        pos = 0
+        while pos < len(text):
+            if self.in_fence:
+                close = FENCE_CLOSE.search(text, pos)
+                out.append(text[pos:close.start() if close else len(text)])
+                if not close:
+                    break
+                self.in_fence = False
+                pos = close.end()
+            else:
+                fence = FENCE_OPEN.search(text, pos)
+                out.append(TOKEN_PATTERN.sub(_replace, text[pos:fence.start() if fence else len(text)]))
+                if not fence:
+                    break
+                self.in_fence = True
+                pos = fence.end()
+        return "".join(out)
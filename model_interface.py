@@ -1,54 +1,814 @@
 import google.generativeai as genai
-import requests
+import httpx
+import asyncio
+import collections
 import json
-from keys import gemini_key, groq_key, openrouter_key
+import os
+import time
+import threading
+import weakref
+from google.api_core import exceptions as google_exceptions
+import json_extract
+import provider_registry as registry
+import provider_router
+import rate_limiter
+import response_cache
+import tracing
 
-def query_gemini(prompt):
+# ==========================================
+# PROVIDER CLIENTS (built once per event loop, reused by every call)
+# ==========================================
+# Providers (endpoints, models, keys, timeouts, concurrency) come from
+# provider_registry; see its header for the config file format.
+
+# Keep-alive connections per provider. Sized for parallel fan-out and
+# per-file code generation, which can have several requests in flight.
+POOL_SIZE = 16
+
+# httpx clients, semaphores and Gemini models are bound to the event loop
+# that created them, so each loop gets its own set.
+_loop_states = weakref.WeakKeyDictionary()
+_gemini_key = None
+
+
+def _state():
+    loop = asyncio.get_running_loop()
+    state = _loop_states.get(loop)
+    if state is None:
+        state = {"clients": {}, "semaphores": {}, "gemini": {}}
+        _loop_states[loop] = state
+    return state
+
+
+def _semaphore(provider):
+    """Caps in-flight requests per provider at its configured concurrency"""
+    semaphores = _state()["semaphores"]
+    if provider not in semaphores:
+        semaphores[provider] = asyncio.Semaphore(registry.get(provider)["concurrency"])
+    return semaphores[provider]
+
+
+def _get_client(provider, headers):
+    """Return the shared httpx.AsyncClient for a provider, creating it on first use.
+
+    Clients are keyed on the provider's config, so re-registering a provider with
+    new settings gets a fresh client.
+    """
+    config = registry.get(provider)
+    clients = _state()["clients"]
+    key = (provider, id(config))
+    client = clients.get(key)
+    if client is None:
+        client = httpx.AsyncClient(
+            headers=headers,
+            timeout=config["timeout"],
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+        )
+        clients[key] = client
+    return client
+
+
+def _get_gemini_model(provider, system=None):
+    """Configure the Gemini SDK and build the model object once per loop.
+
+    The SDK takes the system instruction when the model is built, so there is one
+    model object per (provider, system instruction); templates only have a few.
+    The SDK holds a single global API key, so every SDK-backed Gemini provider
+    shares the most recently configured key; give a provider a url to use REST.
+    """
+    global _gemini_key
+    config = registry.get(provider)
+    models = _state()["gemini"]
+    key = (provider, id(config), system)
+    if key not in models:
+        if _gemini_key != config["api_key"]:
+            genai.configure(api_key=config["api_key"])
+            _gemini_key = config["api_key"]
+        models[key] = genai.GenerativeModel(config["model"], system_instruction=system)
+    return models[key]
+
+
+# ==========================================
+# RAW PROVIDER CALLS (raise on failure)
+# ==========================================
+def label(provider):
+    return registry.label(provider)
+
+
+def panel():
+    """Providers that answer in the fan-out modes (consensus, voting)"""
+    return registry.panel()
+
+
+def _params(provider):
+    """Extra generation settings (e.g. {"temperature": 0.2}); part of the response-cache key"""
+    return registry.get(provider)["params"]
+
+
+class ProviderError(Exception):
+    """A provider answered with an error status. str() is the message shown to the user."""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _status_error(provider, status, body, headers):
+    return ProviderError(
+        f"{label(provider)} API Error: {status} - {body}",
+        status=status,
+        retry_after=rate_limiter.parse_retry_after(headers.get("retry-after")),
+    )
+
+
+def _model_id(provider):
+    return registry.get(provider)["model"]
+
+
+class StreamError(str):
+    """The last chunk of a stream whose provider failed: the user-facing error message"""
+
+
+def _error_text(provider, e):
+    if isinstance(e, ProviderError):
+        return str(e)
+    return f"{label(provider)} ERROR → {str(e)}"
+
+
+def _split_prompt(prompt):
+    """(system, user) for a prompt that is either a string or a pair from prompt_templates"""
+    if isinstance(prompt, tuple):
+        return prompt
+    return None, prompt
+
+
+def _prompt_text(prompt):
+    """The whole prompt as one string, for token estimates, cache keys and traces"""
+    system, user = _split_prompt(prompt)
+    return f"{system}\n\n{user}" if system else user
+
+
+def _json_fields(provider, json_mode):
+    """Request fields that ask for JSON output, per the provider's structured_output setting.
+
+    json_mode is True (any JSON) or a JSON schema dict; the schema is only sent to
+    providers configured with structured_output "json_schema".
+    """
+    config = registry.get(provider)
+    support = config["structured_output"]
+    if not json_mode or not support:
+        return {}
+    schema = json_mode if isinstance(json_mode, dict) and support == "json_schema" else None
+    if config["type"] == "gemini":
+        fields = {"responseMimeType": "application/json"}
+        if schema:
+            fields["responseJsonSchema"] = schema
+        return fields
+    if schema:
+        return {"response_format": {"type": "json_schema", "json_schema": {"name": "response", "schema": schema}}}
+    return {"response_format": {"type": "json_object"}}
+
+
+def _gemini_request(provider, prompt, stream=False, json_mode=None):
+    """URL, headers and payload for a Gemini REST generateContent call"""
+    config = registry.get(provider)
+    action = "streamGenerateContent?alt=sse" if stream else "generateContent"
+    url = f"{config['url'].rstrip('/')}/v1beta/models/{config['model']}:{action}"
+    headers = {"x-goog-api-key": config["api_key"], "Content-Type": "application/json", **config["headers"]}
+    system, user = _split_prompt(prompt)
+    payload = {"contents": [{"role": "user", "parts": [{"text": user}]}]}
+    if system:
+        # Sent ahead of the contents, so Gemini's implicit caching can reuse it
+        payload["systemInstruction"] = {"parts": [{"text": system}]}
+    generation_config = {**config["params"], **_json_fields(provider, json_mode)}
+    if generation_config:
+        payload["generationConfig"] = generation_config
+    return url, headers, payload
+
+
+def _gemini_text(data):
+    candidates = data.get("candidates") or [{}]
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+
+def _chat_request(provider, prompt, stream=False, json_mode=None):
+    """URL, headers and payload for an OpenAI-compatible chat-completions call"""
+    config = registry.get(provider)
+    headers = {"Content-Type": "application/json", **config["headers"]}
+    if config["api_key"].strip():
+        # Local inference servers usually run without a key
+        headers["Authorization"] = f"Bearer {config['api_key'].strip()}"
+    system, user = _split_prompt(prompt)
+    messages = [{"role": "user", "content": user}]
+    if system:
+        if config["prompt_cache"] == "cache_control":
+            # Explicit cache breakpoint (Anthropic models, e.g. through OpenRouter)
+            system = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        messages.insert(0, {"role": "system", "content": system})
+    payload = {
+        "model": config["model"],
+        "messages": messages,
+        **config["params"],
+        **_json_fields(provider, json_mode),
+    }
+    if stream:
+        payload["stream"] = True
+    return config["url"], headers, payload
+
+
+def _uses_sdk(provider):
+    """Gemini providers without a url go through the google-generativeai SDK"""
+    config = registry.get(provider)
+    return config["type"] == "gemini" and not config.get("url")
+
+
+async def _call(provider, prompt, json_mode=None):
+    """One request. Returns (text, total tokens used or None)."""
+    config = registry.get(provider)
+    if _uses_sdk(provider):
+        generation_config = dict(config["params"])
+        if _json_fields(provider, json_mode):
+            generation_config["response_mime_type"] = "application/json"
+        system, user = _split_prompt(prompt)
+        async with _semaphore(provider):
+            response = await _get_gemini_model(provider, system).generate_content_async(
+                user,
+                generation_config=generation_config or None,
+                request_options={"timeout": config["timeout"]},
+            )
+        usage = getattr(response, "usage_metadata", None)
+        return response.text, getattr(usage, "total_token_count", None)
+
+    if config["type"] == "gemini":
+        url, headers, payload = _gemini_request(provider, prompt, json_mode=json_mode)
+    else:
+        url, headers, payload = _chat_request(provider, prompt, json_mode=json_mode)
+    async with _semaphore(provider):
+        response = await _get_client(provider, headers).post(url, json=payload)
+    if response.status_code != 200:
+        raise _status_error(provider, response.status_code, response.text, response.headers)
+    data = response.json()
+    if config["type"] == "gemini":
+        return _gemini_text(data), (data.get("usageMetadata") or {}).get("totalTokenCount")
+    return data["choices"][0]["message"]["content"], (data.get("usage") or {}).get("total_tokens")
+
+
+async def _stream(provider, prompt):
+    config = registry.get(provider)
+    if _uses_sdk(provider):
+        system, user = _split_prompt(prompt)
+        async with _semaphore(provider):
+            response = await _get_gemini_model(provider, system).generate_content_async(
+                user,
+                generation_config=config["params"] or None,
+                request_options={"timeout": config["timeout"]},
+                stream=True,
+            )
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety metadata) raise on .text
+                    continue
+                if text:
+                    yield text
+        return
+
+    # The REST APIs stream server-sent events
+    if config["type"] == "gemini":
+        url, headers, payload = _gemini_request(provider, prompt, stream=True)
+    else:
+        url, headers, payload = _chat_request(provider, prompt, stream=True)
+    async with _semaphore(provider):
+        async with _get_client(provider, headers).stream("POST", url, json=payload) as response:
+            if response.status_code != 200:
+                body = (await response.aread()).decode(errors="replace")
+                raise _status_error(provider, response.status_code, body, response.headers)
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                if config["type"] == "gemini":
+                    text = _gemini_text(json.loads(data))
+                else:
+                    choices = json.loads(data).get("choices") or [{}]
+                    text = (choices[0].get("delta") or {}).get("content")
+                if text:
+                    yield text
+
+
+# ==========================================
+# RETRIES & RATE LIMITS
+# ==========================================
+# Every request first reserves capacity from the provider's rate limiter (see
+# rate_limiter.RATE_LIMITS). Throttling, 5xx and network errors are retried with
+# exponential backoff and jitter; a Retry-After header sets the delay and pauses
+# the whole provider, since every in-flight caller would hit the same limit. A
+# Retry-After longer than rate_limiter.BACKOFF_CAP is not waited out at all.
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+GEMINI_RETRYABLE = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+
+def _retry_delay(e, attempt):
+    """Seconds to wait before retrying after e, or None if it isn't worth retrying"""
+    if isinstance(e, ProviderError):
+        if e.status not in RETRY_STATUSES:
+            return None
+        if e.retry_after is None:
+            return rate_limiter.backoff_delay(attempt)
+        # A longer Retry-After is usually a quota (e.g. a daily limit): fail now so the
+        # caller can fail over instead of pausing the whole provider for minutes or hours
+        return e.retry_after if e.retry_after <= rate_limiter.BACKOFF_CAP else None
+    if isinstance(e, (httpx.TransportError,) + GEMINI_RETRYABLE):
+        return rate_limiter.backoff_delay(attempt)
+    return None
+
+
+def _throttled(e):
+    return getattr(e, "status", None) == 429 or isinstance(e, google_exceptions.ResourceExhausted)
+
+
+def _circuit_open(provider):
+    return ProviderError(f"{label(provider)} is unavailable (circuit open), skipped")
+
+
+async def _wait_before_retry(limiter, e, delay):
+    if _throttled(e):
+        # The next limiter.acquire() waits out the pause
+        limiter.pause(delay)
+    else:
+        await asyncio.sleep(delay)
+
+
+def _record_outcome(provider, e):
+    """Health verdict for a call that gave up with e; rate limiting doesn't count against the provider"""
+    if _throttled(e):
+        provider_router.release(provider)
+    else:
+        provider_router.record_failure(provider)
+
+
+async def _call_with_retry(provider, prompt, span=None, json_mode=None):
+    limiter = rate_limiter.get_limiter(provider, _model_id(provider))
+    estimated = rate_limiter.estimate_request_tokens(_prompt_text(prompt))
+    if not provider_router.acquire(provider):
+        raise _circuit_open(provider)
+    recorded = False
     try:
-        genai.configure(api_key=gemini_key)
-        gemini_model = genai.GenerativeModel("gemini-2.0-flash")
-        return gemini_model.generate_content(prompt).text
+        for attempt in range(rate_limiter.MAX_RETRIES + 1):
+            await limiter.acquire(estimated)
+            try:
+                start = time.perf_counter()
+                text, used = await _call(provider, prompt, json_mode)
+                latency = time.perf_counter() - start
+                _latency_samples[provider].append(latency)
+                provider_router.record_success(provider, latency)
+                recorded = True
+                limiter.settle(estimated, used)
+                if span is not None:
+                    span.set(tokens=used, retries=attempt)
+                return text
+            except Exception as e:
+                # Failed requests aren't billed; give the reserved tokens back
+                limiter.settle(estimated, 0)
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt == rate_limiter.MAX_RETRIES or provider_router.is_open(provider):
+                    _record_outcome(provider, e)
+                    recorded = True
+                    if span is not None:
+                        span.set(retries=attempt)
+                    raise
+                await _wait_before_retry(limiter, e, delay)
+    finally:
+        if not recorded:
+            # Cancelled (e.g. the losing side of a hedge)
+            provider_router.release(provider)
+
+
+async def _stream_with_retry(provider, prompt, span=None):
+    """Streaming counterpart; only retries if nothing has been yielded yet"""
+    limiter = rate_limiter.get_limiter(provider, _model_id(provider))
+    estimated = rate_limiter.estimate_request_tokens(_prompt_text(prompt))
+    if not provider_router.acquire(provider):
+        raise _circuit_open(provider)
+    recorded = False
+    try:
+        for attempt in range(rate_limiter.MAX_RETRIES + 1):
+            await limiter.acquire(estimated)
+            started = False
+            start = time.perf_counter()
+            try:
+                async for text in _stream(provider, prompt):
+                    started = True
+                    yield text
+                provider_router.record_success(provider, time.perf_counter() - start)
+                recorded = True
+                if span is not None:
+                    span.set(retries=attempt)
+                return
+            except Exception as e:
+                if not started:
+                    limiter.settle(estimated, 0)
+                delay = _retry_delay(e, attempt)
+                if started or delay is None or attempt == rate_limiter.MAX_RETRIES or provider_router.is_open(provider):
+                    _record_outcome(provider, e)
+                    recorded = True
+                    if span is not None:
+                        span.set(retries=attempt)
+                    raise
+                await _wait_before_retry(limiter, e, delay)
+    finally:
+        if not recorded:
+            # Cancelled, or the consumer stopped reading early
+            provider_router.release(provider)
+
+
+# ==========================================
+# RESPONSE CACHE (opt-in)
+# ==========================================
+# Enable with enable_cache() or by setting SYNQ_CACHE=1 (or SYNQ_CACHE=<path>).
+# Only successful responses are stored. SQLite reads and writes run in worker
+# threads, so a slow disk doesn't stall the other requests on the provider loop.
+_cache = None
+
+
+def enable_cache(path=response_cache.DEFAULT_PATH, max_bytes=response_cache.DEFAULT_MAX_BYTES, ttl=response_cache.DEFAULT_TTL):
+    global _cache
+    _cache = response_cache.ResponseCache(path, max_bytes=max_bytes, ttl=ttl)
+    return _cache
+
+
+def disable_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None
+
+
+def cache_stats():
+    return _cache.stats() if _cache is not None else None
+
+
+def _cache_key(provider, prompt, json_mode=None):
+    params = _params(provider)
+    fields = _json_fields(provider, json_mode)
+    if fields:
+        params = {**params, "json": fields}
+    return response_cache.ResponseCache.make_key(provider, _model_id(provider), _prompt_text(prompt), params)
+
+
+if os.environ.get("SYNQ_CACHE"):
+    enable_cache() if os.environ["SYNQ_CACHE"] == "1" else enable_cache(os.environ["SYNQ_CACHE"])
+
+
+# ==========================================
+# ASYNC PROVIDER API
+# ==========================================
+def _start_llm_span(provider, prompt, streamed):
+    return tracing.start_span(
+        f"llm.{provider}", "llm",
+        provider=provider, model=_model_id(provider), prompt_chars=len(_prompt_text(prompt)),
+        streamed=streamed, cache_hit=False, retries=0,
+    )
+
+
+async def _aquery_checked(provider, prompt, json_mode=None):
+    """Returns (text, ok). On failure text is the user-facing error message."""
+    span = _start_llm_span(provider, prompt, streamed=False)
+    text, ok = None, False
+    try:
+        cache = _cache
+        key = _cache_key(provider, prompt, json_mode) if cache is not None else None
+        if key is not None:
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                span.set(cache_hit=True)
+                text, ok = cached, True
+                return text, ok
+        text = await _call_with_retry(provider, prompt, span, json_mode)
+        ok = True
+        if key is not None and text:
+            await asyncio.to_thread(cache.put, key, text)
+        return text, ok
+    except asyncio.CancelledError:
+        span.set(cancelled=True)
+        raise
     except Exception as e:
-        return f"Gemini ERROR → {str(e)}"
+        text = _error_text(provider, e)
+        return text, ok
+    finally:
+        span.finish(ok=ok, response_chars=len(text or ""))
 
-def query_groq(prompt):
+async def aquery(provider, prompt, json_mode=None):
+    """Query any registered provider by name. json_mode: see _json_fields."""
+    text, _ = await _aquery_checked(provider, prompt, json_mode)
+    return text
+
+async def aquery_gemini(prompt):
+    return await aquery("gemini", prompt)
+
+async def aquery_groq(prompt):
+    return await aquery("groq", prompt)
+
+async def aquery_openrouter(prompt):
+    return await aquery("openrouter", prompt)
+
+
+# ==========================================
+# STREAMING (async generators of text chunks)
+# ==========================================
+async def _astream(provider, prompt):
+    span = _start_llm_span(provider, prompt, streamed=True)
+    ok = False
+    chunks = []
     try:
-        groq_url = "https://api.groq.com/openai/v1/chat/completions"
-        groq_payload = {
-            "model": "llama-3.3-70b-versatile",
-            "messages": [{"role": "user", "content": prompt}]
-        }
-        groq_headers = {
-            "Authorization": f"Bearer {groq_key}",
-            "Content-Type": "application/json"
-        }
-        groq_response = requests.post(groq_url, json=groq_payload, headers=groq_headers)
-        
-        if groq_response.status_code == 200:
-            return groq_response.json()["choices"][0]["message"]["content"]
-        else:
-            return f"Groq API Error: {groq_response.status_code} - {groq_response.text}"
+        cache = _cache
+        key = _cache_key(provider, prompt) if cache is not None else None
+        if key is not None:
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                span.set(cache_hit=True)
+                ok = True
+                chunks.append(cached)
+                yield cached
+                return
+        async for text in _stream_with_retry(provider, prompt, span):
+            if not chunks:
+                span.set(first_chunk=time.perf_counter() - span.start)
+            chunks.append(text)
+            yield text
+        ok = True
+        if key is not None and chunks:
+            await asyncio.to_thread(cache.put, key, "".join(chunks))
     except Exception as e:
-        return f"Groq ERROR → {str(e)}"
+        yield StreamError(_error_text(provider, e))
+    finally:
+        span.finish(ok=ok, response_chars=sum(len(c) for c in chunks))
+
+def astream(provider, prompt):
+    """Stream from any registered provider by name. On failure the last chunk is a StreamError."""
+    return _astream(provider, prompt)
+
+def astream_gemini(prompt):
+    return astream("gemini", prompt)
+
+def astream_groq(prompt):
+    return astream("groq", prompt)
+
+def astream_openrouter(prompt):
+    return astream("openrouter", prompt)
+
+
+async def _timed_aquery(provider, prompt):
+    start = time.perf_counter()
+    text, ok = await _aquery_checked(provider, prompt)
+    return provider, text or "No response", ok, time.perf_counter() - start
+
+
+async def aquery_all(prompt, providers=None, on_result=None):
+    """Send the same prompt to several providers at once (default: the registry's panel).
+
+    Returns {provider: {"text": ..., "ok": bool, "latency": seconds}}; "ok" is False when
+    the provider still failed after retries and "text" holds the error message.
+    on_result(provider, text, latency) is called as each provider finishes, so callers
+    can report progress in completion order.
+    """
+    results = {}
+    if providers is None:
+        providers = registry.panel()
+    tasks = [asyncio.ensure_future(_timed_aquery(name, prompt)) for name in providers]
+    for finished in asyncio.as_completed(tasks):
+        name, text, ok, latency = await finished
+        results[name] = {"text": text, "ok": ok, "latency": latency}
+        if on_result:
+            on_result(name, text, latency)
+    return results
+
+
+# ==========================================
+# HEDGED REQUESTS
+# ==========================================
+# Send to the primary provider; if it hasn't produced a good answer after a delay
+# (its recent p90 latency), also send to a backup and take whichever valid answer
+# arrives first. The slower request is cancelled.
+HEDGE_DEFAULT_DELAY = 5.0
+HEDGE_MIN_SAMPLES = 10
+
+# Recent successful request latencies per provider, used for the hedge delay
+_latency_samples = collections.defaultdict(lambda: collections.deque(maxlen=50))
+
+
+def hedge_delay(provider):
+    samples = sorted(_latency_samples[provider])
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return samples[int(len(samples) * 0.9) - 1]
+
+
+async def aquery_hedged(prompt, primary, backup, delay=None, validate=None):
+    """Race primary against a delayed backup. Returns (text, provider that answered).
+
+    validate(text) -> bool rejects answers that arrived but are unusable (e.g. off-topic
+    code); a rejected or failed primary starts the backup immediately. If neither gives a
+    valid answer, the primary's response is returned. Without a backup (None, or the
+    same provider as primary) this is a plain query to primary.
+    """
+    if backup is None or backup == primary:
+        text, _ = await _aquery_checked(primary, prompt)
+        return text, primary
+    if delay is None:
+        delay = hedge_delay(primary)
+
+    async def attempt(provider):
+        text, ok = await _aquery_checked(provider, prompt)
+        return provider, text, ok and (validate is None or validate(text))
+
+    pending = {asyncio.ensure_future(attempt(primary))}
+    backup_started = False
+    fallback = {}
+    try:
+        while pending:
+            timeout = None if backup_started else delay
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                provider, text, good = task.result()
+                if good:
+                    return text, provider
+                fallback[provider] = text
+            if not backup_started:
+                # Primary is slow, failed, or gave an invalid answer
+                pending.add(asyncio.ensure_future(attempt(backup)))
+                backup_started = True
+    finally:
+        for task in pending:
+            task.cancel()
+    if primary in fallback:
+        return fallback[primary], primary
+    return fallback[backup], backup
+
+
+# ==========================================
+# ROLE ROUTING
+# ==========================================
+# Modes ask for a role ("judge", "architect", "coder", "fixer", ...) and the router
+# picks the healthiest provider for it (see provider_router.ROLES). If the chosen
+# provider still fails after retries, the next healthy one for the role is tried.
+def route(role, exclude=()):
+    return provider_router.pick(role, exclude)
+
+
+async def _aquery_role(role, prompt, json_mode=None):
+    """Returns (text, provider that answered, ok). On total failure, the first error is returned."""
+    tried = []
+    first_error = None
+    while len(tried) < len(provider_router.ROLES.get(role, [role])):
+        provider = route(role, exclude=tried)
+        if provider in tried:
+            break
+        tried.append(provider)
+        text, ok = await _aquery_checked(provider, prompt, json_mode)
+        if ok:
+            return text, provider, True
+        if first_error is None:
+            first_error = (text, provider, False)
+    return first_error
+
+
+async def aquery_role(role, prompt, json_mode=None):
+    """Returns (text, provider that answered). On total failure, the first error is returned."""
+    text, provider, _ = await _aquery_role(role, prompt, json_mode)
+    return text, provider
+
+
+# ==========================================
+# JSON RESPONSES
+# ==========================================
+# Stages that need JSON ask the provider for JSON output where it supports it,
+# extract the value with json_extract, and if that fails send one short repair
+# prompt (just the broken JSON, not the original prompt) before giving up.
+async def aquery_json(role, prompt, expect=dict, require=(), schema=None):
+    """Returns (value or None, raw response text)"""
+    text, provider, ok = await _aquery_role(role, prompt, json_mode=schema or True)
+    if not ok:
+        return None, text
+    value, error = json_extract.parse(text, expect, require)
+    if value is not None:
+        return value, text
+    with tracing.span("json.repair", role=role, error=error):
+        repair = json_extract.repair_prompt(text, error, expect, require, schema)
+        fixed, _, ok = await _aquery_role(role, repair, json_mode=schema or True)
+    if not ok:
+        return None, text
+    value, _ = json_extract.parse(fixed, expect, require)
+    return value, text if value is None else fixed
+
+
+# ==========================================
+# SYNC API (thin wrappers over the async API)
+# ==========================================
+# All sync calls run on one background event loop, so connection pools and
+# semaphores are shared no matter how many threads call in.
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop():
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="synq-provider-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+def run_sync(coro):
+    """Run a coroutine on the shared provider loop and block until it finishes"""
+    loop = _get_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("Sync provider calls cannot be made from inside the provider event loop; await the async API instead.")
+    # Calls made on the loop thread belong to the caller's current trace span
+    parent = tracing.current()
+    if parent is not None:
+        coro = tracing.under(parent, coro)
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def query(provider, prompt):
+    return run_sync(aquery(provider, prompt))
+
+def query_gemini(prompt):
+    return query("gemini", prompt)
+
+def query_groq(prompt):
+    return query("groq", prompt)
 
 def query_openrouter(prompt):
+    return query("openrouter", prompt)
+
+
+def query_hedged(prompt, primary, backup, delay=None, validate=None):
+    """Sync version of aquery_hedged. validate runs on the provider loop thread, so keep it cheap."""
+    return run_sync(aquery_hedged(prompt, primary, backup, delay, validate))
+
+
+def query_role(role, prompt, json_mode=None):
+    text, _ = run_sync(aquery_role(role, prompt, json_mode))
+    return text
+
+
+def query_role_checked(role, prompt, json_mode=None):
+    """Like query_role, but returns (text, ok); on failure text is the error message"""
+    text, _, ok = run_sync(_aquery_role(role, prompt, json_mode))
+    return text, ok
+
+
+def query_json(role, prompt, expect=dict, require=(), schema=None):
+    """Sync version of aquery_json. Returns (value or None, raw response text)."""
+    return run_sync(aquery_json(role, prompt, expect, require, schema))
+
+
+def _iterate_sync(agen):
+    """Drive an async generator on the provider loop, yielding its items synchronously"""
     try:
-        openrouter_url = "https://openrouter.ai/api/v1/chat/completions"
-        openrouter_payload = {
-            "model": "meta-llama/llama-3.1-8b-instruct",
-            "messages": [{"role": "user", "content": prompt}]
-        }
-        openrouter_headers = {
-            "Authorization": f"Bearer {openrouter_key}",
-            "Content-Type": "application/json",
-            "Referer": "http://localhost",
-            "X-Title": "Multi LLM CLI Tool"
-        }
-        openrouter_response = requests.post(openrouter_url, json=openrouter_payload, headers=openrouter_headers)
-
-        if openrouter_response.status_code == 200:
-            return openrouter_response.json()["choices"][0]["message"]["content"]
-        else:
-            return f"OpenRouter API Error: {openrouter_response.status_code} - {openrouter_response.text}"
-    except Exception as e:
-        return f"OpenRouter ERROR → {str(e)}"
+        while True:
+            try:
+                yield run_sync(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        run_sync(agen.aclose())
+
+
+def stream(provider, prompt):
+    return _iterate_sync(astream(provider, prompt))
+
+def stream_gemini(prompt):
+    return stream("gemini", prompt)
+
+def stream_groq(prompt):
+    return stream("groq", prompt)
+
+def stream_openrouter(prompt):
+    return stream("openrouter", prompt)
+
+
+def stream_role(role, prompt):
+    """Stream from the provider currently routed for role (no mid-stream failover)"""
+    return stream(route(role), prompt)
+
+
+def query_all(prompt, providers=None, on_result=None):
+    """Sync version of aquery_all. on_result runs on the provider loop thread."""
+    return run_sync(aquery_all(prompt, providers, on_result))
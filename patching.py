@@ -0,0 +1,164 @@
+import re
+
+# ==========================================
+# PATCH-BASED EDITS
+# ==========================================
+# The fixer returns small edits instead of whole files. Two formats are accepted:
+# search/replace blocks (what we ask for) and unified diffs (what some models
+# produce anyway). Edits are validated against the current file; if anything
+# doesn't match, the caller falls back to a full rewrite.
+
+SEARCH_MARK = "<<<<<<< SEARCH"
+DIVIDER = "======="
+REPLACE_MARK = ">>>>>>> REPLACE"
+
+EDIT_FORMAT_INSTRUCTIONS = f"""Return ONLY search/replace blocks describing your changes, in this exact format:
+{SEARCH_MARK}
+exact lines copied from the current file
+{DIVIDER}
+the new lines that replace them
+{REPLACE_MARK}
+Use one block per change. Each SEARCH section must match the current file exactly (including
+indentation) and appear only once in it, so include a few surrounding lines. Do NOT return the
+whole file and do NOT wrap the blocks in markdown."""
+
+HUNK_HEADER = re.compile(r"^@@(?: -(\d+)(?:,\d+)? \+\d+(?:,\d+)?)? @@")
+
+
+class PatchError(ValueError):
+    """The model's edits are malformed or don't match the current file"""
+
+
+def parse_search_replace(text):
+    """Return [(search, replace), ...] from search/replace blocks"""
+    blocks = []
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        if lines[i].strip() != SEARCH_MARK:
+            i += 1
+            continue
+        search, replace = [], []
+        i += 1
+        while i < len(lines) and lines[i].strip() != DIVIDER:
+            search.append(lines[i])
+            i += 1
+        if i == len(lines):
+            raise PatchError("search block without '=======' divider")
+        i += 1
+        while i < len(lines) and lines[i].strip() != REPLACE_MARK:
+            replace.append(lines[i])
+            i += 1
+        if i == len(lines):
+            raise PatchError("search block without '>>>>>>> REPLACE' end marker")
+        i += 1
+        blocks.append(("\n".join(search), "\n".join(replace)))
+    return blocks
+
+
+def _find_lines(haystack, needle, hint=None):
+    """Index where the list of lines needle occurs in haystack.
+
+    Exact matches are tried first, then matches ignoring trailing whitespace.
+    With several matches, the one closest to hint wins; without a hint it's an error.
+    """
+    if not needle:
+        raise PatchError("empty search text")
+    for normalize in (lambda line: line, lambda line: line.rstrip()):
+        target = [normalize(line) for line in needle]
+        first = target[0]
+        matches = [
+            i for i in range(len(haystack) - len(needle) + 1)
+            if normalize(haystack[i]) == first
+            and [normalize(line) for line in haystack[i:i + len(needle)]] == target
+        ]
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            if hint is None:
+                raise PatchError(f"search text matches {len(matches)} places: {needle[0].strip()!r}")
+            return min(matches, key=lambda i: abs(i - hint))
+    raise PatchError(f"search text not found: {needle[0].strip()!r}")
+
+
+def apply_search_replace(original, blocks):
+    lines = original.splitlines()
+    for search, replace in blocks:
+        if not search.strip():
+            if lines:
+                raise PatchError("empty search block on a non-empty file")
+            lines = replace.splitlines()
+            continue
+        search_lines = search.splitlines()
+        start = _find_lines(lines, search_lines)
+        lines[start:start + len(search_lines)] = replace.splitlines()
+    return _join(lines, original)
+
+
+def parse_unified_diff(text):
+    """Return [(old_start or None, old_lines, new_lines), ...] from a unified diff"""
+    hunks = []
+    current = None
+    for line in text.splitlines():
+        header = HUNK_HEADER.match(line)
+        if header:
+            start = int(header.group(1)) - 1 if header.group(1) else None
+            current = (start, [], [])
+            hunks.append(current)
+            continue
+        if current is None or line.startswith(("--- ", "+++ ", "\\ No newline", "```")):
+            continue
+        if line.startswith("+"):
+            current[2].append(line[1:])
+        elif line.startswith("-"):
+            current[1].append(line[1:])
+        elif line.startswith(" ") or line == "":
+            current[1].append(line[1:])
+            current[2].append(line[1:])
+        else:
+            raise PatchError(f"unexpected diff line: {line!r}")
+    return hunks
+
+
+def apply_unified_diff(original, hunks):
+    lines = original.splitlines()
+    offset = 0
+    for old_start, old_lines, new_lines in hunks:
+        hint = old_start + offset if old_start is not None else None
+        if not old_lines:
+            # Pure insertion: no context to anchor on, trust the line number
+            if hint is None:
+                raise PatchError("insertion hunk without a line number")
+            at = min(max(hint + 1, 0), len(lines))
+        else:
+            at = _find_lines(lines, old_lines, hint=hint)
+        lines[at:at + len(old_lines)] = new_lines
+        offset += len(new_lines) - len(old_lines)
+    return _join(lines, original)
+
+
+def _join(lines, original):
+    text = "\n".join(lines)
+    if original.endswith("\n") or not original:
+        text += "\n"
+    return text
+
+
+def apply_edits(original, response):
+    """Apply the edits in a model response to original.
+
+    Returns (new_text, None) on success or (None, reason) if the response holds no
+    usable edits, so the caller can fall back to asking for the whole file.
+    """
+    try:
+        if SEARCH_MARK in response:
+            blocks = parse_search_replace(response)
+            if blocks:
+                return apply_search_replace(original, blocks), None
+        if re.search(r"^@@", response, re.MULTILINE):
+            hunks = parse_unified_diff(response)
+            if hunks:
+                return apply_unified_diff(original, hunks), None
+    except PatchError as e:
+        return None, str(e)
+    return None, "no search/replace blocks or diff hunks found"
@@ -0,0 +1,243 @@
+import hashlib
+import mmap
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# ==========================================
+# IGNORE-AWARE PROJECT LOADER
+# ==========================================
+# Walks a project honouring .gitignore files, skips binaries by sniffing their
+# content and text assets / generated files by name, caps per-file and total size, and hashes files concurrently. It yields
+# a lightweight index; file contents are only read when read_text() is called.
+
+# Always skipped, even without a .gitignore
+DEFAULT_IGNORES = ["node_modules/", ".git/", "__pycache__/", "dist/", "build/", ".venv/", "venv/", ".synq_cache/"]
+
+# Text that is not worth reviewing or rewriting: images and fonts that pass the
+# binary sniff (SVG), lockfiles, minified bundles and source maps
+ASSET_PATTERNS = [
+    "*.svg", "*.png", "*.jpg", "*.jpeg", "*.gif", "*.ico", "*.webp", "*.mp4", "*.woff", "*.woff2", "*.ttf", "*.eot",
+    "*.min.js", "*.min.css", "*.map", "*.lock",
+    "package-lock.json", "npm-shrinkwrap.json", "pnpm-lock.yaml",
+]
+
+MAX_FILE_BYTES = 512 * 1024
+MAX_TOTAL_BYTES = 20 * 1024 * 1024
+SNIFF_BYTES = 8192
+MMAP_THRESHOLD = 64 * 1024
+LOADER_WORKERS = 8
+
+LANGUAGES = {
+    ".py": "python", ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript", ".cjs": "javascript",
+    ".ts": "typescript", ".tsx": "typescript", ".html": "html", ".htm": "html", ".css": "css",
+    ".scss": "scss", ".json": "json", ".md": "markdown", ".yml": "yaml", ".yaml": "yaml",
+    ".toml": "toml", ".sh": "shell", ".go": "go", ".rs": "rust", ".java": "java", ".rb": "ruby",
+    ".php": "php", ".c": "c", ".h": "c", ".cpp": "cpp", ".hpp": "cpp", ".sql": "sql", ".txt": "text",
+}
+
+FileEntry = namedtuple("FileEntry", ["path", "abs_path", "size", "sha256", "language"])
+
+
+def _glob_to_regex(pattern):
+    """Translate one gitignore glob (without leading '!' or trailing '/') to a regex"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(pattern[i]))
+                i += 1
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """gitignore-style matcher. Later rules win; '!' re-includes; a trailing '/' matches directories only."""
+
+    def __init__(self, patterns=(), base=""):
+        self.rules = []
+        self.add(patterns, base)
+
+    def add(self, patterns, base=""):
+        for line in patterns:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            # A slash anywhere but the end anchors the pattern to the .gitignore's directory
+            anchored = "/" in line
+            line = line.lstrip("/")
+            regex = _glob_to_regex(line)
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            self.rules.append((base, re.compile(f"^{regex}$"), negate, dir_only))
+
+    def add_file(self, path, base=""):
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                self.add(f.readlines(), base)
+        except OSError:
+            pass
+
+    def ignored(self, rel_path, is_dir=False):
+        result = False
+        for base, regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                candidate = rel_path[len(base) + 1:]
+            else:
+                candidate = rel_path
+            if regex.match(candidate):
+                result = not negate
+        return result
+
+
+_ASSETS = IgnoreRules(ASSET_PATTERNS)
+
+
+def language_of(path):
+    name = os.path.basename(path)
+    if name == "Dockerfile":
+        return "docker"
+    if name == "Makefile":
+        return "make"
+    return LANGUAGES.get(os.path.splitext(name)[1].lower(), "other")
+
+
+def is_binary(sample):
+    """Content sniff: NUL bytes or bytes that are not valid UTF-8 mean binary"""
+    if b"\0" in sample:
+        return True
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the sample boundary is still text
+        return e.start < len(sample) - 3
+    return False
+
+
+def _hash_file(abs_path, size):
+    """Return the sha256 of a text file, or None if it is binary or unreadable"""
+    try:
+        with open(abs_path, "rb") as f:
+            if size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if is_binary(data[:SNIFF_BYTES]):
+                        return None
+                    return hashlib.sha256(data).hexdigest()
+            data = f.read()
+    except (OSError, ValueError):
+        return None
+    if is_binary(data[:SNIFF_BYTES]):
+        return None
+    return hashlib.sha256(data).hexdigest()
+
+
+def walk_project(root, rules=None, stats=None):
+    """Yield (rel_path, abs_path, size) for every non-ignored file under root"""
+    if rules is None:
+        rules = IgnoreRules(DEFAULT_IGNORES)
+    for dirpath, dirs, files in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir
+        if ".gitignore" in files:
+            rules.add_file(os.path.join(dirpath, ".gitignore"), rel_dir)
+
+        dirs[:] = sorted(
+            d for d in dirs
+            if not rules.ignored(f"{rel_dir}/{d}" if rel_dir else d, is_dir=True)
+        )
+        for name in sorted(files):
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            if rules.ignored(rel_path):
+                if stats is not None:
+                    stats["ignored"] = stats.get("ignored", 0) + 1
+                continue
+            abs_path = os.path.join(dirpath, name)
+            try:
+                size = os.stat(abs_path).st_size
+            except OSError:
+                continue
+            yield rel_path, abs_path, size
+
+
+def scan_project(root, max_file_bytes=MAX_FILE_BYTES, max_total_bytes=MAX_TOTAL_BYTES, workers=LOADER_WORKERS, stats=None):
+    """Yield a FileEntry for each text file in the project, hashed concurrently.
+
+    Assets (ASSET_PATTERNS), files over max_file_bytes, binaries, and anything past
+    max_total_bytes are skipped;
+    pass a dict as stats to get counts of what was skipped and why.
+    """
+    if stats is None:
+        stats = {}
+    for key in ("files", "bytes", "ignored", "asset", "too_large", "over_budget", "binary"):
+        stats.setdefault(key, 0)
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for rel_path, abs_path, size in walk_project(root, stats=stats):
+            if _ASSETS.ignored(rel_path):
+                stats["asset"] += 1
+                continue
+            if size > max_file_bytes:
+                stats["too_large"] += 1
+                continue
+            if total + size > max_total_bytes:
+                stats["over_budget"] += 1
+                continue
+            total += size
+            futures[pool.submit(_hash_file, abs_path, size)] = (rel_path, abs_path, size)
+
+        for future in as_completed(futures):
+            rel_path, abs_path, size = futures[future]
+            digest = future.result()
+            if digest is None:
+                stats["binary"] += 1
+                continue
+            stats["files"] += 1
+            stats["bytes"] += size
+            yield FileEntry(rel_path, abs_path, size, digest, language_of(rel_path))
+
+
+def load_index(root, **kwargs):
+    """scan_project() collected into {rel_path: FileEntry}, sorted by path"""
+    return dict(sorted((entry.path, entry) for entry in scan_project(root, **kwargs)))
+
+
+def read_text(entry):
+    with open(entry.abs_path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
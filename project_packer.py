@@ -0,0 +1,121 @@
+import os
+
+# ==========================================
+# TOKEN-BUDGETED PROJECT PACKER
+# ==========================================
+# Builds the "--- FILE: path ---" view of a project that QA prompts use, split into
+# shards that each fit a token budget, so large projects are reviewed in full by
+# several parallel calls instead of being cut off at a fixed character count.
+
+CHARS_PER_TOKEN = 4
+# Share of a shard's budget the repeated header may take (see file_index), and the
+# share that is always left for file contents, however long the header is
+HEADER_SHARE = 0.25
+MIN_CONTENT_SHARE = 0.5
+
+# Files that usually tie the project together; reviewed first
+ENTRY_POINTS = (
+    "index.html", "main.py", "app.py", "__main__.py", "server.py", "manage.py",
+    "package.json", "index.js", "main.js", "app.js", "server.js", "index.ts", "main.ts",
+    "requirements.txt", "pyproject.toml",
+)
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for code and English)"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def prioritize(paths, recent=()):
+    """Order paths: entry points first, then recently changed files (in the order
+    given, newest first), then the rest"""
+    recent = {path: i for i, path in enumerate(recent)}
+
+    def rank(path):
+        name = os.path.basename(path)
+        if name in ENTRY_POINTS:
+            return (0, ENTRY_POINTS.index(name), path.count("/"), path)
+        if path in recent:
+            return (1, recent[path], path.count("/"), path)
+        return (2, 0, path.count("/"), path)
+
+    return sorted(paths, key=rank)
+
+
+def file_index(files, budget_tokens, unchanged=()):
+    """The "PROJECT FILE LIST" header repeated in every shard, within budget_tokens.
+
+    Lists every file with its size, or, when that is too long (large projects),
+    one line per directory with its file count and size. Directories that still
+    don't fit are summed up in a last line.
+    """
+    unchanged = set(unchanged)
+    lines = ["PROJECT FILE LIST:\n"]
+    for path, content in files.items():
+        note = ", unchanged since last review" if path in unchanged else ""
+        lines.append(f"- {path} ({len(content)} chars{note})\n")
+    text = "".join(lines)
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+
+    dirs = {}
+    for path, content in files.items():
+        entry = dirs.setdefault(os.path.dirname(path) or ".", [0, 0, 0])
+        entry[0] += 1
+        entry[1] += len(content)
+        entry[2] += path in unchanged
+    lines = [f"PROJECT FILE LIST ({len(files)} files, by directory):\n"]
+    used = estimate_tokens(lines[0]) + 20
+    for i, (directory, (count, chars, same)) in enumerate(sorted(dirs.items())):
+        note = f", {same} unchanged" if same else ""
+        line = f"- {directory}/ ({count} files, {chars} chars{note})\n"
+        if used + estimate_tokens(line) > budget_tokens:
+            lines.append(f"- ... and {len(dirs) - i} more directories\n")
+            break
+        lines.append(line)
+        used += estimate_tokens(line)
+    return "".join(lines)
+
+
+def pack_project(files, budget_tokens, recent=(), header="", max_shards=None):
+    """Split {path: content} into shards of at most budget_tokens each.
+
+    header is repeated at the top of every shard (e.g. file_index()); at least
+    MIN_CONTENT_SHARE of the budget stays for file contents. A file larger than a
+    whole shard is truncated with a visible marker. Returns (shards, omitted) where
+    shards is a list of {"paths": [...], "text": str} and omitted lists the paths
+    that did not fit within max_shards.
+    """
+    header_tokens = estimate_tokens(header) if header else 0
+    room = max(budget_tokens - header_tokens, int(budget_tokens * MIN_CONTENT_SHARE))
+
+    shards = []
+    omitted = []
+    parts, paths, used = [], [], 0
+
+    def close_shard():
+        if paths:
+            shards.append({"paths": list(paths), "text": header + "".join(parts)})
+            parts.clear()
+            paths.clear()
+
+    for path in prioritize(files, recent):
+        block = f"\n--- FILE: {path} ---\n{files[path]}\n"
+        cost = estimate_tokens(block)
+        if cost > room:
+            keep = room * CHARS_PER_TOKEN - 200
+            head = f"--- FILE: {path} (truncated, {len(files[path])} chars total) ---"
+            block = f"\n{head}\n{files[path][:max(keep, 0)]}\n"
+            cost = estimate_tokens(block)
+        if used + cost > room:
+            close_shard()
+            used = 0
+        if max_shards is not None and len(shards) >= max_shards:
+            omitted.append(path)
+            continue
+        parts.append(block)
+        paths.append(path)
+        used += cost
+    close_shard()
+
+    return shards, omitted
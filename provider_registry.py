@@ -0,0 +1,170 @@
+import json
+import os
+
+import keys
+import provider_router
+import rate_limiter
+
+# ==========================================
+# PROVIDER REGISTRY
+# ==========================================
+# Every provider SYNQ can call, by name. Two kinds are supported: "openai" (any
+# OpenAI-compatible chat-completions endpoint: Groq, OpenRouter, vLLM, Ollama,
+# llama.cpp, LM Studio...) and "gemini" (Google's SDK, or its REST API when a url
+# is given). The built-in providers below can be changed and new ones added from
+# a JSON file: SYNQ_PROVIDERS=<path>, or synq_providers.json in the working
+# directory. Example:
+#
+#   {
+#     "providers": {
+#       "local": {"type": "openai", "url": "http://localhost:11434/v1/chat/completions",
+#                 "model": "qwen2.5-coder:7b", "timeout": 300, "concurrency": 2},
+#       "groq": {"model": "llama-3.1-8b-instant", "api_key_env": "GROQ_API_KEY"},
+#       "openrouter": {"enabled": false}
+#     },
+#     "roles": {"coder": ["local", "groq"], "fixer": ["local", "gemini"]},
+#     "panel": ["gemini", "groq", "local"]
+#   }
+#
+# Provider settings: type, url, model, label, api_key or api_key_env, headers,
+# params (extra request fields, e.g. temperature), timeout, concurrency, rpm, tpm,
+# structured_output. The last one says how the provider can be asked for JSON:
+# "json_object" (JSON mode), "json_schema" (JSON mode constrained by a schema) or
+# null (plain prompt only, for models/servers without JSON mode). prompt_cache is
+# "cache_control" for providers that only cache a prompt prefix when it is marked
+# (Anthropic models, e.g. through OpenRouter); OpenAI-compatible APIs and Gemini
+# cache repeated prefixes on their own, so it defaults to null.
+# "roles" overrides provider_router.ROLES; "panel" is who answers in the fan-out
+# modes (consensus, voting).
+
+CONFIG_FILE = "synq_providers.json"
+
+DEFAULTS = {"timeout": 120, "concurrency": 8, "headers": {}, "params": {}, "api_key": "", "structured_output": None,
+            "prompt_cache": None}
+
+BUILTIN_PROVIDERS = {
+    "gemini": {
+        "type": "gemini",
+        "label": "Gemini",
+        "model": "gemini-2.0-flash",
+        "url": os.environ.get("SYNQ_GEMINI_URL"),
+        "api_key": os.environ.get("GEMINI_API_KEY", keys.gemini_key),
+        "structured_output": "json_object",
+    },
+    "groq": {
+        "type": "openai",
+        "label": "Groq",
+        "url": os.environ.get("SYNQ_GROQ_URL", "https://api.groq.com/openai/v1/chat/completions"),
+        "model": "llama-3.3-70b-versatile",
+        "api_key": os.environ.get("GROQ_API_KEY", keys.groq_key),
+        "structured_output": "json_object",
+    },
+    "openrouter": {
+        "type": "openai",
+        "label": "OpenRouter",
+        "url": os.environ.get("SYNQ_OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions"),
+        "model": "meta-llama/llama-3.1-8b-instruct",
+        "api_key": os.environ.get("OPENROUTER_API_KEY", keys.openrouter_key),
+        "headers": {"Referer": "http://localhost", "X-Title": "Multi LLM CLI Tool"},
+    },
+}
+
+PROVIDER_TYPES = ("openai", "gemini")
+STRUCTURED_OUTPUT = (None, "json_object", "json_schema")
+PROMPT_CACHE = (None, "cache_control")
+
+PROVIDERS = {}
+PANEL = []
+_default_roles = {role: list(order) for role, order in provider_router.ROLES.items()}
+
+
+def _build(name, settings, base=None):
+    config = {**DEFAULTS, **(base or {}), **settings}
+    config["headers"] = {**(base or {}).get("headers", {}), **settings.get("headers", {})}
+    if config.get("api_key_env") and "api_key" not in settings:
+        # Unset variable: keep the inherited key (e.g. from keys.py for a built-in provider)
+        config["api_key"] = os.environ.get(config["api_key_env"], config["api_key"])
+    config.setdefault("label", name)
+    if config.get("type") not in PROVIDER_TYPES:
+        raise ValueError(f"Provider '{name}': type must be one of {', '.join(PROVIDER_TYPES)}")
+    if not config.get("model"):
+        raise ValueError(f"Provider '{name}': no model configured")
+    if config["type"] == "openai" and not config.get("url"):
+        raise ValueError(f"Provider '{name}': OpenAI-compatible providers need a url")
+    if config["structured_output"] not in STRUCTURED_OUTPUT:
+        raise ValueError(f"Provider '{name}': structured_output must be json_object, json_schema or null")
+    if config["prompt_cache"] not in PROMPT_CACHE:
+        raise ValueError(f"Provider '{name}': prompt_cache must be cache_control or null")
+    return config
+
+
+def _apply_limits(name, config):
+    if config.get("rpm") is not None or config.get("tpm") is not None:
+        rate_limiter.configure(name, rpm=config.get("rpm"), tpm=config.get("tpm"))
+
+
+def register(name, **settings):
+    """Add a provider, or change settings of an existing one (unspecified settings are kept)"""
+    PROVIDERS[name] = _build(name, settings, PROVIDERS.get(name))
+    _apply_limits(name, PROVIDERS[name])
+    return PROVIDERS[name]
+
+
+def get(name):
+    try:
+        return PROVIDERS[name]
+    except KeyError:
+        raise KeyError(f"Unknown provider '{name}'. Registered: {', '.join(PROVIDERS)}") from None
+
+
+def names():
+    return list(PROVIDERS)
+
+
+def label(name):
+    return PROVIDERS[name]["label"] if name in PROVIDERS else name
+
+
+def panel():
+    """Providers that answer in the fan-out modes, in display order"""
+    return list(PANEL)
+
+
+def set_panel(providers):
+    for name in providers:
+        get(name)  # raises for unknown providers
+    PANEL[:] = list(providers)
+
+
+def load(path=None, builtin_only=False):
+    """(Re)build the registry from the built-ins plus the config file, if any"""
+    PROVIDERS.clear()
+    for name, settings in BUILTIN_PROVIDERS.items():
+        PROVIDERS[name] = _build(name, settings)
+
+    if not builtin_only:
+        path = path or os.environ.get("SYNQ_PROVIDERS") or (CONFIG_FILE if os.path.exists(CONFIG_FILE) else None)
+    data = {}
+    if path and not builtin_only:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+    for name, settings in (data.get("providers") or {}).items():
+        if settings.get("enabled", True) is False:
+            PROVIDERS.pop(name, None)
+            continue
+        PROVIDERS[name] = _build(name, settings, PROVIDERS.get(name))
+    for name, config in PROVIDERS.items():
+        _apply_limits(name, config)
+
+    PANEL[:] = [name for name in (data.get("panel") or BUILTIN_PROVIDERS) if name in PROVIDERS]
+
+    # Roles may only name registered providers; a role left empty falls back to the panel
+    roles = {**_default_roles, **(data.get("roles") or {})}
+    provider_router.ROLES.clear()
+    for role, order in roles.items():
+        provider_router.ROLES[role] = [name for name in order if name in PROVIDERS] or panel() or names()
+    return path
+
+
+load()
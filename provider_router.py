@@ -0,0 +1,164 @@
+import threading
+import time
+
+# ==========================================
+# HEALTH-AWARE PROVIDER ROUTER
+# ==========================================
+# Modes ask for a role ("judge", "coder", ...) instead of a provider. Each role has
+# a preference order; the router walks it and returns the first provider that is
+# healthy. Health is tracked once per call, after its retries: an EWMA of latency
+# and error rate, plus a circuit breaker that opens after repeated failures and
+# lets one probe request through (half-open) once the cooldown has passed. Rate
+# limiting (429) is not a failure here; the rate limiter deals with it.
+#
+# pick() only chooses a provider. The probe slot of a half-open provider is
+# claimed by acquire() when a request is actually sent, and given back by
+# release() if the call ends without a verdict (cancelled, or rate limited).
+
+ROLES = {
+    "judge": ["gemini", "openrouter", "groq"],
+    "architect": ["gemini", "groq", "openrouter"],
+    "qa": ["gemini", "openrouter", "groq"],
+    "coder": ["groq", "openrouter", "gemini"],
+    "fixer": ["openrouter", "groq", "gemini"],
+    "pro": ["gemini", "openrouter", "groq"],
+    "con": ["groq", "openrouter", "gemini"],
+    "debate_judge": ["openrouter", "gemini", "groq"],
+    "creator": ["gemini", "groq", "openrouter"],
+    "craftsman": ["groq", "openrouter", "gemini"],
+    "polisher": ["openrouter", "gemini", "groq"],
+}
+
+EWMA_ALPHA = 0.3
+FAILURE_THRESHOLD = 3        # consecutive failures that open the circuit
+ERROR_RATE_THRESHOLD = 0.6   # ...or an error-rate EWMA above this (after MIN_CALLS)
+MIN_CALLS = 5
+COOLDOWN = 30.0              # seconds an open circuit waits before a probe
+PROBE_TIMEOUT = 120.0        # a probe that never reports back is abandoned after this
+DEGRADED_LATENCY = 45.0      # EWMA seconds above which a provider is skipped if another is fine
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class ProviderHealth:
+    def __init__(self):
+        self.latency = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_started = None
+
+    def snapshot(self):
+        return {
+            "state": self.state,
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "calls": self.calls,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+_health = {}
+_lock = threading.Lock()
+
+
+def _get(provider):
+    if provider not in _health:
+        _health[provider] = ProviderHealth()
+    return _health[provider]
+
+
+def record_success(provider, latency):
+    with _lock:
+        health = _get(provider)
+        health.calls += 1
+        health.latency = latency if health.latency is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * health.latency
+        health.error_rate = (1 - EWMA_ALPHA) * health.error_rate
+        health.consecutive_failures = 0
+        health.state = CLOSED
+        health.probe_started = None
+
+
+def record_failure(provider):
+    with _lock:
+        health = _get(provider)
+        health.calls += 1
+        health.error_rate = EWMA_ALPHA + (1 - EWMA_ALPHA) * health.error_rate
+        health.consecutive_failures += 1
+        tripped = (
+            health.consecutive_failures >= FAILURE_THRESHOLD
+            or (health.calls >= MIN_CALLS and health.error_rate > ERROR_RATE_THRESHOLD)
+        )
+        if health.state == HALF_OPEN or tripped:
+            health.state = OPEN
+            health.opened_at = time.monotonic()
+            health.probe_started = None
+
+
+def is_open(provider):
+    """True while the provider's circuit is open; callers stop retrying and fail over"""
+    with _lock:
+        return _get(provider).state == OPEN
+
+
+def _available(health, now):
+    """Whether a call may go to this provider now (half-open: no probe in flight)"""
+    if health.state == CLOSED:
+        return True
+    if health.state == OPEN and now - health.opened_at >= COOLDOWN:
+        health.state = HALF_OPEN
+        health.probe_started = None
+    if health.state == HALF_OPEN:
+        return health.probe_started is None or now - health.probe_started > PROBE_TIMEOUT
+    return False
+
+
+def acquire(provider):
+    """Called before a request is sent. Claims the probe slot when half-open;
+    False if the circuit is open or another probe is in flight."""
+    now = time.monotonic()
+    with _lock:
+        health = _get(provider)
+        if not _available(health, now):
+            return False
+        if health.state == HALF_OPEN:
+            health.probe_started = now
+        return True
+
+
+def release(provider):
+    """Give back a claimed probe slot without recording a success or failure"""
+    with _lock:
+        health = _get(provider)
+        if health.state == HALF_OPEN:
+            health.probe_started = None
+
+
+def pick(role, exclude=()):
+    """Best provider for a role right now.
+
+    Preference order is kept unless a provider's circuit is open or its latency is
+    degraded while a later candidate is healthy. If nothing is available the first
+    preference is returned anyway, so the call fails loudly instead of silently.
+    """
+    candidates = [p for p in ROLES.get(role, [role]) if p not in exclude] or list(ROLES.get(role, [role]))
+    now = time.monotonic()
+    with _lock:
+        degraded = []
+        for provider in candidates:
+            health = _get(provider)
+            if health.state == CLOSED and health.latency is not None and health.latency > DEGRADED_LATENCY:
+                degraded.append(provider)
+                continue
+            if _available(health, now):
+                return provider
+        if degraded:
+            return degraded[0]
+    return candidates[0]
+
+
+def health_report():
+    with _lock:
+        return {provider: health.snapshot() for provider, health in _health.items()}
@@ -0,0 +1,127 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# ==========================================
+# PER-PROVIDER RATE LIMITING
+# ==========================================
+# Each provider (or provider/model) gets two token buckets: requests per minute
+# and tokens per minute. Callers reserve capacity up front and sleep until the
+# reservation is due, so parallel callers queue fairly instead of all firing at
+# once and getting 429s. A 429 with Retry-After pauses the whole provider.
+
+# rpm = requests/minute, tpm = tokens/minute (prompt + completion).
+# Keys are "provider" or "provider/model"; the more specific key wins.
+RATE_LIMITS = {
+    "gemini": {"rpm": 15, "tpm": 1_000_000},
+    "groq": {"rpm": 30, "tpm": 12_000},
+    "openrouter": {"rpm": 20, "tpm": 200_000},
+}
+
+# Completion tokens assumed per request until the real usage is known
+EXPECTED_COMPLETION_TOKENS = 1024
+
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+
+class TokenBucket:
+    """Refills at per_minute/60 per second up to capacity. Thread-safe, never blocks."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """Take amount (the balance may go negative) and return the seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount):
+        """Give back (or, when negative, take extra) capacity once the real cost is known"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ProviderLimiter:
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+
+    async def acquire(self, estimated_tokens):
+        wait = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+        wait = max(wait, self.paused_until - time.monotonic())
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Correct a reservation once the real cost is known; 0 (a failed request) refunds it all"""
+        if actual_tokens is not None:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+
+    def pause(self, seconds):
+        """Hold every caller of this provider back, e.g. after a 429 with Retry-After"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def configure(provider, rpm=None, tpm=None, model=None):
+    """Set limits for a provider (or one model of it). Takes effect for new limiters."""
+    key = f"{provider}/{model}" if model else provider
+    limits = dict(RATE_LIMITS.get(key) or RATE_LIMITS.get(provider) or {})
+    if rpm is not None:
+        limits["rpm"] = rpm
+    if tpm is not None:
+        limits["tpm"] = tpm
+    RATE_LIMITS[key] = limits
+    with _limiters_lock:
+        _limiters.pop(key, None)
+
+
+def get_limiter(provider, model=None):
+    key = f"{provider}/{model}" if model and f"{provider}/{model}" in RATE_LIMITS else provider
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limits = RATE_LIMITS.get(key, {})
+            limiter = ProviderLimiter(limits.get("rpm", 60), limits.get("tpm", 1_000_000))
+            _limiters[key] = limiter
+        return limiter
+
+
+def estimate_request_tokens(prompt):
+    return len(prompt) // 4 + 1 + EXPECTED_COMPLETION_TOKENS
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter: somewhere in [d/2, d] for d = base * 2^attempt"""
+    delay = min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(delay / 2, delay)
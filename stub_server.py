@@ -0,0 +1,315 @@
+"""Local stand-in for the LLM providers, for benchmarks and offline runs.
+
+Serves the OpenAI-compatible chat-completions API (as Groq and OpenRouter) and
+Gemini's REST generateContent API, with configurable latency, response size,
+error rate and streaming. Replies are shaped after the prompt, so the modes'
+JSON stages (architect, QA, voting judge, runtime fixes) parse them like real ones.
+
+    python stub_server.py --port 8765 --latency 0.5 --error-rate 0.05
+
+then point SYNQ at it:
+
+    SYNQ_GROQ_URL=http://127.0.0.1:8765/groq/chat/completions
+    SYNQ_OPENROUTER_URL=http://127.0.0.1:8765/openrouter/chat/completions
+    SYNQ_GEMINI_URL=http://127.0.0.1:8765/gemini
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Per-provider behaviour. latency is the median seconds per request; jitter is the
+# sigma of a log-normal around it (0 = fixed). chars is the size of free-text replies.
+DEFAULT_PROFILE = {
+    "latency": 0.5,
+    "jitter": 0.3,
+    "chars": 1500,
+    "error_rate": 0.0,
+    "error_status": 503,
+    "stream_chunks": 20,
+    "ttft": 0.3,        # share of the latency spent before the first streamed chunk
+    "qa_fail_rate": 0.5,
+}
+
+PROFILES = {
+    "gemini": {"latency": 0.8},
+    "groq": {"latency": 0.3},
+    "openrouter": {"latency": 1.0},
+}
+
+ARCHITECT_FILES = ("index.html", "style.css", "app.js", "main.py")
+
+WORDS = (
+    "the system design balances latency throughput and cost while keeping every stage "
+    "observable **clear** structure helps readers follow the argument and _concrete_ "
+    "examples make each point easier to evaluate in practice"
+).split()
+
+
+def filler(chars, seed=0):
+    """Deterministic prose-like text of about chars characters, in short paragraphs"""
+    rng = random.Random(seed)
+    out, size = [], 0
+    while size < chars:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+        if rng.random() < 0.2:
+            sentence += "\n\n"
+        out.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(out)[:chars]
+
+
+def _file_body(path, chars):
+    if path.endswith(".py"):
+        lines = [f"# {line}" for line in filler(chars, seed=len(path)).split(". ")]
+        return "\n".join(lines) + '\nprint("ok")\n'
+    if path.endswith(".html"):
+        body = filler(chars, seed=1)
+        return (
+            '<!DOCTYPE html>\n<html>\n<head>\n<link rel="stylesheet" href="style.css">\n</head>\n<body>\n'
+            f'<section class="hero"><h1>Headline</h1></section>\n<section class="features"><p>{body}</p></section>\n'
+            '<script src="app.js"></script>\n</body>\n</html>\n'
+        )
+    if path.endswith(".css"):
+        return "\n".join(f".block-{i} {{ margin: {i}px; padding: {i}px; }}" for i in range(max(1, chars // 40)))
+    if path.endswith(".js"):
+        return "\n".join(f"// {line}" for line in filler(chars, seed=2).split(". ")) + "\nconsole.log('ok');\n"
+    return filler(chars, seed=3)
+
+
+def _current_content(prompt):
+    match = re.search(r"Current Content:\n(.*?)\n\s*Return ONLY", prompt, re.DOTALL)
+    return match.group(1) if match else ""
+
+
+def reply_for(prompt, profile, rng):
+    """A plausible reply for the kind of prompt the modes send"""
+    chars = profile["chars"]
+    if "Design a PRODUCTION-READY" in prompt:
+        return json.dumps({path: f"{path} for the project" for path in ARCHITECT_FILES})
+    if "FILE TO CREATE:" in prompt:
+        path = re.search(r"FILE TO CREATE: (\S+)", prompt).group(1)
+        return _file_body(path, chars)
+    if "Senior QA Engineer" in prompt:
+        if rng.random() < profile["qa_fail_rate"]:
+            files = re.findall(r"--- FILE: (\S+)", prompt) or ["index.html"]
+            return json.dumps({"status": "FAIL", "issues": [{"file": files[0], "description": "Missing alt text on images"}]})
+        return json.dumps({"status": "PASS", "issues": []})
+    if "<<<<<<< SEARCH" in prompt:
+        lines = [line for line in _current_content(prompt).splitlines() if line.strip()]
+        if lines:
+            last = lines[-1]
+            return f"<<<<<<< SEARCH\n{last}\n=======\n{last}\n>>>>>>> REPLACE"
+    if "Return ONLY the COMPLETE fixed code" in prompt:
+        return _current_content(prompt) or filler(chars)
+    if "The application failed to run" in prompt:
+        return json.dumps({"file": "main.py", "code": 'print("fixed")\n'})
+    if "analyzing an existing project" in prompt:
+        return json.dumps({"project_type": "Web app", "issues": ["Broken link"], "files_to_fix": ["index.html"], "recommendations": []})
+    if "Rate them 0-10" in prompt:
+        names = re.findall(r'"([^"]+)": <int>', prompt) or ["gemini", "groq", "openrouter"]
+        return json.dumps({
+            "scores": {name: rng.randint(5, 9) for name in names},
+            "judge_perspective": filler(min(chars, 600), seed=4),
+        })
+    return filler(chars, seed=len(prompt))
+
+
+def _message_text(content):
+    # A string, or a list of parts (e.g. a system prompt marked with cache_control)
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content)
+    return content
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, profiles=None, seed=None):
+        super().__init__(address, StubHandler)
+        self.profiles = {}
+        for provider in ("gemini", "groq", "openrouter"):
+            self.profiles[provider] = {**DEFAULT_PROFILE, **PROFILES.get(provider, {}), **(profiles or {}).get(provider, {})}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def configure(self, provider=None, **settings):
+        """Change the profile of one provider, or of all of them when provider is None"""
+        for name in ([provider] if provider else list(self.profiles)):
+            self.profiles[name].update(settings)
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {name: {"requests": 0, "errors": 0, "streamed": 0, "bytes_out": 0} for name in self.profiles}
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.stats))
+
+    def count(self, provider, **increments):
+        with self.lock:
+            for key, value in increments.items():
+                self.stats[provider][key] += value
+
+    def draw_latency(self, profile):
+        with self.lock:
+            jitter = self.rng.lognormvariate(0, profile["jitter"]) if profile["jitter"] else 1.0
+        return profile["latency"] * jitter
+
+    def draw_error(self, profile):
+        with self.lock:
+            return self.rng.random() < profile["error_rate"]
+
+    def new_rng(self):
+        with self.lock:
+            return random.Random(self.rng.random())
+
+    def handle_error(self, request, client_address):
+        # Cancelled requests (e.g. the losing side of a hedge) just drop the connection
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.server.snapshot())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.startswith("/gemini/"):
+            provider = "gemini"
+            contents = [body.get("systemInstruction") or {}] + body.get("contents", [])
+            prompt = "".join(part.get("text", "") for content in contents for part in content.get("parts", []))
+            stream = ":streamGenerateContent" in self.path
+        elif self.path.startswith(("/groq/", "/openrouter/")):
+            provider = self.path.split("/")[1]
+            prompt = "".join(_message_text(message.get("content", "")) for message in body.get("messages", []))
+            stream = bool(body.get("stream"))
+        else:
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        server = self.server
+        profile = server.profiles[provider]
+        latency = server.draw_latency(profile)
+        server.count(provider, requests=1, streamed=int(stream))
+
+        if server.draw_error(profile):
+            time.sleep(latency * profile["ttft"])
+            server.count(provider, errors=1)
+            status = profile["error_status"]
+            headers = {"Retry-After": "1"} if status == 429 else {}
+            self._send_json(status, {"error": {"message": "stub error", "code": status}}, headers)
+            return
+
+        text = reply_for(prompt, profile, server.new_rng())
+        tokens = len(prompt) // 4 + len(text) // 4
+        server.count(provider, bytes_out=len(text))
+        if stream:
+            self._stream(provider, text, tokens, latency, profile)
+            return
+        time.sleep(latency)
+        if provider == "gemini":
+            payload = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}],
+                       "usageMetadata": {"totalTokenCount": tokens}}
+        else:
+            payload = {"choices": [{"message": {"role": "assistant", "content": text}}],
+                       "usage": {"total_tokens": tokens}}
+        self._send_json(200, payload)
+
+    def _send_json(self, status, payload, headers=None):
+        out = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(out)
+
+    def _stream(self, provider, text, tokens, latency, profile):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(event):
+            data = f"data: {json.dumps(event) if not isinstance(event, str) else event}\n\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        count = max(1, profile["stream_chunks"])
+        size = math.ceil(len(text) / count) or 1
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        time.sleep(latency * profile["ttft"])
+        gap = latency * (1 - profile["ttft"]) / len(pieces)
+        for piece in pieces:
+            if provider == "gemini":
+                send({"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}]})
+            else:
+                send({"choices": [{"delta": {"content": piece}}]})
+            time.sleep(gap)
+        if provider == "gemini":
+            send({"candidates": [{"content": {"parts": [{"text": ""}]}, "finishReason": "STOP"}], "usageMetadata": {"totalTokenCount": tokens}})
+        else:
+            send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start(profiles=None, host="127.0.0.1", port=0, seed=None):
+    """Start a stub server on a background thread and return it (see StubServer.url)"""
+    server = StubServer((host, port), profiles, seed)
+    threading.Thread(target=server.serve_forever, name="synq-stub-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stub of the Gemini, Groq and OpenRouter APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, help="median seconds per request (all providers)")
+    parser.add_argument("--jitter", type=float, help="log-normal sigma of the latency")
+    parser.add_argument("--chars", type=int, help="size of free-text replies")
+    parser.add_argument("--error-rate", type=float, help="share of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int)
+    parser.add_argument("--stream-chunks", type=int)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), seed=args.seed)
+    overrides = {key: value for key, value in vars(args).items()
+                 if key in DEFAULT_PROFILE and value is not None}
+    server.configure(**overrides)
+    print(f"Stub LLM server on {server.url} (stats at {server.url}/stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import collections
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+
+# ==========================================
+# TRACING
+# ==========================================
+# Every LLM call and pipeline stage records a span: name, category, start/end,
+# thread, parent span and free-form attributes (provider, model, sizes, tokens,
+# retries, cache hits...). Spans are kept in memory and can be exported as JSONL
+# or as Chrome trace events (open in chrome://tracing or https://ui.perfetto.dev).
+#
+# The current span is tracked in a context variable, so nesting works inside one
+# thread or asyncio task. Work handed to other threads keeps its parent when the
+# callable is wrapped with bind().
+
+MAX_SPANS = 100_000
+
+# Set SYNQ_TRACE=<directory> to write every mode's trace there (see save())
+TRACE_DIR = os.environ.get("SYNQ_TRACE")
+
+_spans = collections.deque(maxlen=MAX_SPANS)
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_current = contextvars.ContextVar("synq_current_span", default=None)
+_origin = time.perf_counter()
+_origin_wall = time.time()
+
+
+class Span:
+    __slots__ = ("id", "name", "category", "parent", "thread", "start", "end", "attrs")
+
+    def __init__(self, name, category, parent, attrs):
+        self.id = next(_ids)
+        self.name = name
+        self.category = category
+        self.parent = parent
+        self.thread = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.end = None
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key, amount=1):
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def finish(self, **attrs):
+        if self.end is None:
+            self.attrs.update(attrs)
+            self.end = time.perf_counter()
+            with _lock:
+                _spans.append(self)
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "parent": self.parent,
+            "name": self.name,
+            "category": self.category,
+            "thread": self.thread,
+            "start": self.start - _origin,
+            "duration": self.duration,
+            **self.attrs,
+        }
+
+
+def current():
+    return _current.get()
+
+
+def start_span(name, category="stage", parent=None, **attrs):
+    """Start a span without making it current; call span.finish() when done"""
+    if parent is None:
+        parent_span = _current.get()
+        parent = parent_span.id if parent_span is not None else None
+    return Span(name, category, parent, attrs)
+
+
+@contextlib.contextmanager
+def span(name, category="stage", **attrs):
+    """with span("qa.attempt", attempt=2) as s: ...  (s.set(...) adds attributes)"""
+    s = start_span(name, category, **attrs)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.set(error=type(e).__name__)
+        raise
+    finally:
+        _current.reset(token)
+        s.finish()
+
+
+def bind(fn):
+    """Wrap fn so it runs under the caller's current span, e.g. on a worker thread"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+async def under(parent, coro):
+    """Await coro with parent as its current span (used to cross into the provider loop)"""
+    _current.set(parent)
+    return await coro
+
+
+# ==========================================
+# EXPORT & SUMMARY
+# ==========================================
+def spans(since=None):
+    """Finished spans, oldest first. since is a span id (see mark()) to skip earlier ones."""
+    with _lock:
+        finished = list(_spans)
+    if since is not None:
+        finished = [s for s in finished if s.id > since]
+    return sorted(finished, key=lambda s: s.start)
+
+
+def mark():
+    """An id to pass to spans()/summary() to only see what happens from now on"""
+    return next(_ids)
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+
+
+def export_jsonl(path, since=None):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for s in spans(since):
+            f.write(json.dumps(s.to_dict(), default=str) + "\n")
+    return path
+
+
+def export_chrome(path, since=None):
+    """Chrome trace-event format: one complete ("X") event per span, one lane per thread"""
+    threads = {}
+    events = []
+    for s in spans(since):
+        tid = threads.setdefault(s.thread, len(threads) + 1)
+        events.append({
+            "name": s.name,
+            "cat": s.category,
+            "ph": "X",
+            "ts": (s.start - _origin) * 1e6,
+            "dur": s.duration * 1e6,
+            "pid": 1,
+            "tid": tid,
+            "args": {"id": s.id, "parent": s.parent, **s.attrs},
+        })
+    for name, tid in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}})
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"started": _origin_wall}}, f, default=str)
+    return path
+
+
+def save(name, since=None, directory=None):
+    """Write <name>-<timestamp>.jsonl and .trace.json (Chrome) into directory or TRACE_DIR.
+
+    Returns the two paths, or None when no directory is configured.
+    """
+    directory = directory or TRACE_DIR
+    if not directory:
+        return None
+    base = os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+    return export_jsonl(base + ".jsonl", since), export_chrome(base + ".trace.json", since)
+
+
+def summary(since=None):
+    """Text table of where the time went: stages by name, LLM calls by provider"""
+    finished = spans(since)
+    if not finished:
+        return "No spans recorded."
+
+    stages = collections.OrderedDict()
+    calls = collections.OrderedDict()
+    for s in finished:
+        if s.category == "llm":
+            row = calls.setdefault(s.attrs.get("provider", s.name), collections.Counter())
+            row["calls"] += 1
+            row["seconds"] += s.duration
+            row["tokens"] += s.attrs.get("tokens") or 0
+            row["retries"] += s.attrs.get("retries", 0)
+            row["cache_hits"] += 1 if s.attrs.get("cache_hit") else 0
+            row["errors"] += 1 if s.attrs.get("ok") is False and not s.attrs.get("cancelled") else 0
+            row["max"] = max(row["max"], s.duration)
+        else:
+            row = stages.setdefault(s.name, collections.Counter())
+            row["count"] += 1
+            row["seconds"] += s.duration
+            row["max"] = max(row["max"], s.duration)
+
+    lines = [f"{'STAGE':<24}{'COUNT':>7}{'TOTAL s':>10}{'MEAN s':>9}{'MAX s':>9}"]
+    for name, row in stages.items():
+        lines.append(f"{name:<24}{row['count']:>7}{row['seconds']:>10.2f}{row['seconds'] / row['count']:>9.2f}{row['max']:>9.2f}")
+    if calls:
+        lines.append("")
+        lines.append(f"{'PROVIDER':<24}{'CALLS':>7}{'TOTAL s':>10}{'MEAN s':>9}{'MAX s':>9}{'TOKENS':>9}{'RETRY':>7}{'CACHED':>8}{'ERRORS':>8}")
+        for name, row in calls.items():
+            lines.append(
+                f"{name:<24}{row['calls']:>7}{row['seconds']:>10.2f}{row['seconds'] / row['calls']:>9.2f}{row['max']:>9.2f}"
+                f"{row['tokens']:>9}{row['retries']:>7}{row['cache_hits']:>8}{row['errors']:>8}"
+            )
+    return "\n".join(lines)
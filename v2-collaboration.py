@@ -1,60 +1,50 @@
 import model_interface as models
 
-def get_consensus(prompt, gemini_resp, groq_resp, openrouter_resp):
+def get_consensus(prompt, panel, results):
+    answers = "\n    \n    ".join(
+        f"ANSWER {i} ({models.label(name)}):\n    {results[name]['text']}"
+        for i, name in enumerate(panel, 1)
+    )
     consensus_prompt = f"""
-    You are a wise judge and synthesizer. You have received three different answers to the same user prompt.
+    You are a wise judge and synthesizer. You have received {len(panel)} different answers to the same user prompt.
     
     USER PROMPT: {prompt}
     
-    ANSWER 1 (Gemini):
-    {gemini_resp}
-    
-    ANSWER 2 (Groq):
-    {groq_resp}
-    
-    ANSWER 3 (OpenRouter/Llama):
-    {openrouter_resp}
+    {answers}
     
     Your task is to:
-    1. Analyze the three answers.
+    1. Analyze the {len(panel)} answers.
     2. Identify the common points and any contradictions.
-    3. Synthesize the best possible final answer that combines the strengths of all three.
+    3. Synthesize the best possible final answer that combines the strengths of all of them.
     4. If there are disagreements, explain them and provide the most accurate information.
     
     Provide your response in a clear, structured format.
     """
-    return models.query_gemini(consensus_prompt)
+    return models.query_role("judge", consensus_prompt)
 
 def main():
     prompt = input("Enter your problem: ")
     
     print("\n Fetching responses from models...\n")
     
-    gemini_resp = models.query_gemini(prompt)
-    print(" Gemini received")
-    
-    groq_resp = models.query_groq(prompt)
-    print(" Groq received")
-    
-    openrouter_resp = models.query_openrouter(prompt)
-    print(" OpenRouter received")
+    # Whoever the registry config puts on the panel (providers can be removed or disabled there)
+    panel = models.panel()
+    results = models.query_all(
+        prompt,
+        providers=panel,
+        on_result=lambda name, text, latency: print(f" {models.label(name)} received ({latency:.2f}s)")
+    )
     
     print("\n Building Consensus...\n")
-    consensus = get_consensus(prompt, gemini_resp, groq_resp, openrouter_resp)
+    consensus = get_consensus(prompt, panel, results)
     
+    responses = "\n\n".join(f" {models.label(name).upper()}:\n{results[name]['text']}" for name in panel)
     final_output = f"""
 ======================
      MULTI-LLM OUTPUT
 ======================
 
- GEMINI:
-{gemini_resp}
-
- GROQ:
-{groq_resp}
-
- OPENROUTER (Llama-3.1):
-{openrouter_resp}
+{responses}
 
 ======================
   FINAL CONSENSUS
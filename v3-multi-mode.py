@@ -1,34 +1,50 @@
+import app_runner
+import dep_cache
+import json_extract
 import model_interface as models
+import patching
+from markdown_strip import MarkdownStripper, strip_markdown
+import project_loader
+import project_packer
+import prompt_templates
+import tracing
 import os
-import json
+import hashlib
 import re
-import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
-def strip_markdown(text):
-    """Remove markdown formatting for clean terminal output"""
-    # Remove bold (**text** or __text__)
-    text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
-    text = re.sub(r'__(.+?)__', r'\1', text)
-    
-    # Remove italic (*text* or _text_)
-    text = re.sub(r'\*(.+?)\*', r'\1', text)
-    text = re.sub(r'_(.+?)_', r'\1', text)
-    
-    # Remove code blocks (```code```)
-    text = re.sub(r'```[\w]*\n', '', text)
-    text = re.sub(r'```', '', text)
-    
-    # Remove inline code (`code`)
-    text = re.sub(r'`(.+?)`', r'\1', text)
-    
-    # Remove headers (# Header)
-    text = re.sub(r'^#{1,6}\s+', '', text, flags=re.MULTILINE)
-    
-    # Remove links [text](url) -> text
-    text = re.sub(r'\[(.+?)\]\(.+?\)', r'\1', text)
-    
-    return text
+def print_received(provider, text, latency):
+    """Progress line for parallel fan-out, printed as each provider finishes"""
+    print(f" {models.label(provider)} received ({latency:.2f}s)")
+
+
+def judge_input(result):
+    """A provider's answer as shown to a judge. Failed calls are flagged instead of pasting the error text."""
+    if result.get("ok", True):
+        return result["text"]
+    return "[No answer: this model failed to respond. Do not score or quote it.]"
+
+def stream_response(provider, prompt, header, strip=False):
+    """Print a provider's answer as it streams in. Returns (full raw text, ok).
+
+    With strip, markdown is removed from the printed text as it arrives
+    (MarkdownStripper holds back each line until it is complete).
+    """
+    print(header)
+    chunks = []
+    stripper = MarkdownStripper() if strip else None
+    for chunk in models.stream(provider, prompt):
+        chunks.append(chunk)
+        out = stripper.feed(chunk) if stripper else chunk
+        if out:
+            print(out, end="", flush=True)
+    if stripper:
+        print(stripper.flush(), end="")
+    print("\n")
+    ok = not (chunks and isinstance(chunks[-1], models.StreamError))
+    return "".join(chunks), ok
 
 # ==========================================
 # MODE 1: CONSENSUS BUILDER (Mentor-Level Judge + Scoring + Feedback)
@@ -36,102 +52,59 @@ def strip_markdown(text):
 def mode_consensus(prompt):
     print("\n Fetching responses from models...\n")
 
-    try:
-        gemini_resp = models.query_gemini(prompt) or "No response"
-    except Exception as e:
-        gemini_resp = f"Error: {e}"
-
-    try:
-        groq_resp = models.query_groq(prompt) or "No response"
-    except Exception as e:
-        groq_resp = f"Error: {e}"
-
-    try:
-        openrouter_resp = models.query_openrouter(prompt) or "No response"
-    except Exception as e:
-        openrouter_resp = f"Error: {e}"
+    # The whole panel is queried at once; wall time is the slowest one, not the sum
+    panel = models.panel()
+    with tracing.span("fanout"):
+        results = models.query_all(prompt, providers=panel, on_result=print_received)
+    answers = "\n\n".join(
+        f'{models.label(name)} Response:\n"""{judge_input(results[name])}"""'
+        for name in panel
+    )
 
     print(" Responses received. Synthesizing...\n")
 
-    consensus_prompt = f"""
-You are a highly experienced mentor and evaluator.
-Your tone is strict, clear, confident, and encouraging.
-You are not harsh or rude. You maintain high standards and push for excellence.
-
-You MUST perform 3 tasks:
-
-==========================================
-TASK 1 — MENTOR SCORING (0–10)
-==========================================
-Score each model's response on:
-- Accuracy
-- Depth
-- Clarity
-- Usefulness
-- Completeness
-- Reasoning quality
-
-Give a short justification for each score.
-
-==========================================
-TASK 2 — MENTOR FEEDBACK
-==========================================
-Provide constructive, improvement-focused feedback for each model.
-Be firm but supportive. Give actionable suggestions.
-Avoid insults or rudeness.
-
-==========================================
-TASK 3 — FINAL CONSENSUS ANSWER
-==========================================
-Combine ONLY the strongest parts of the three responses.
-Remove:
-- Repetition
-- Incorrect claims
-- Weak reasoning
-- Unnecessary fluff
-
-Create a final answer that is:
-- Clear
-- Correct
-- Highly structured
-- Deeper than any individual model's output
-- Mentor-level quality
-
-==========================================
-
-User Prompt:
-\"\"\"{prompt}\"\"\"
-
-Gemini Response:
-\"\"\"{gemini_resp}\"\"\"
-
-Groq Response:
-\"\"\"{groq_resp}\"\"\"
-
-OpenRouter Response:
-\"\"\"{openrouter_resp}\"\"\"
-
-Now produce:
-
-1. Mentor Scoring Table  
-2. Mentor Feedback for each model  
-3. Final Consensus Answer
-"""
+    consensus_prompt = prompt_templates.render("consensus", prompt=prompt, answers=answers)
 
+    judge_start = time.perf_counter()
     try:
-        final = models.query_gemini(consensus_prompt)
+        with tracing.span("judge"):
+            final, judge_ok = models.query_role_checked("judge", consensus_prompt)
         final = strip_markdown(final)  # Remove markdown formatting
     except Exception as e:
-        final = f"Consensus generation failed: {e}"
+        final, judge_ok = f"Consensus generation failed: {e}", False
+    judge_latency = time.perf_counter() - judge_start
 
     print("\n FINAL CONSENSUS (MENTOR JUDGE + SCORING + FEEDBACK):\n")
     print(final)
 
+    return {
+        "mode": "consensus",
+        # False when the judge or every panel call failed (the batch runner retries these)
+        "ok": judge_ok and any(result["ok"] for result in results.values()),
+        "responses": results,
+        "judge": final,
+        "timings": {"judge": judge_latency},
+    }
+
 
 
 # ==========================================
 # MODE 2: DEBATE MODE
 # ==========================================
+def debate_round(pro_prompt, con_prompt, pro_header, con_header):
+    """Run one round's PRO (Gemini) and CON (Groq) turns at the same time.
+
+    The two turns of a round never depend on each other, only on earlier rounds.
+    PRO streams live; CON is generated alongside it and printed right after.
+    Returns (pro, con, ok).
+    """
+    with tracing.span("debate.round", round=pro_header.strip()), ThreadPoolExecutor(max_workers=1) as pool:
+        con_future = pool.submit(tracing.bind(models.query_role_checked), "con", con_prompt)
+        pro, pro_ok = stream_response(models.route("pro"), pro_prompt, pro_header, strip=True)
+        con, con_ok = con_future.result()
+    print(f"{con_header}\n{strip_markdown(con)}\n")
+    return pro, con, pro_ok and con_ok
+
 def mode_debate(prompt):
     print("\n REALISTIC COMPETITIVE DEBATE MODE\n")
 
@@ -164,11 +137,7 @@ Debate Topic:
 {prompt}
 """
 
-    pro_arg = models.query_gemini(pro_prompt)
-    con_arg = models.query_groq(con_prompt)
-
-    print(f"🔵 PRO (Opening Statement):\n{strip_markdown(pro_arg)}\n")
-    print(f"🔴 CON (Opening Statement):\n{strip_markdown(con_arg)}\n")
+    pro_arg, con_arg, ok1 = debate_round(pro_prompt, con_prompt, "🔵 PRO (Opening Statement):", "🔴 CON (Opening Statement):")
 
     # -----------------------------
     # ROUND 2 — Cross-Examination
@@ -193,11 +162,7 @@ PRO said:
 \"\"\"{pro_arg}\"\"\"
 """
 
-    pro_cross = models.query_gemini(cross_pro_prompt)
-    con_cross = models.query_groq(cross_con_prompt)
-
-    print(f"🔵 PRO Questions:\n{strip_markdown(pro_cross)}\n")
-    print(f"🔴 CON Questions:\n{strip_markdown(con_cross)}\n")
+    pro_cross, con_cross, ok2 = debate_round(cross_pro_prompt, cross_con_prompt, "🔵 PRO Questions:", "🔴 CON Questions:")
 
     # -----------------------------
     # ROUND 3 — Rebuttals
@@ -230,11 +195,7 @@ PRO argument:
 \"\"\"{pro_arg}\"\"\"
 """
 
-    pro_rebuttal = models.query_gemini(rebuttal_pro_prompt)
-    con_rebuttal = models.query_groq(rebuttal_con_prompt)
-
-    print(f"🔵 PRO Rebuttal:\n{strip_markdown(pro_rebuttal)}\n")
-    print(f"🔴 CON Rebuttal:\n{strip_markdown(con_rebuttal)}\n")
+    pro_rebuttal, con_rebuttal, ok3 = debate_round(rebuttal_pro_prompt, rebuttal_con_prompt, "🔵 PRO Rebuttal:", "🔴 CON Rebuttal:")
 
     # -----------------------------
     # ROUND 4 — Closing Statements
@@ -259,11 +220,7 @@ Deliver a closing statement:
 - Max 5 sentences
 """
 
-    pro_close = models.query_gemini(close_pro_prompt)
-    con_close = models.query_groq(close_con_prompt)
-
-    print(f"🔵 PRO Closing:\n{strip_markdown(pro_close)}\n")
-    print(f"🔴 CON Closing:\n{strip_markdown(con_close)}\n")
+    pro_close, con_close, ok4 = debate_round(close_pro_prompt, close_con_prompt, "🔵 PRO Closing:", "🔴 CON Closing:")
 
     # -----------------------------
     # FINAL — Judge's Decision
@@ -309,8 +266,20 @@ CON Closing:
 Decide the winner and give a 4–6 sentence justification.
 """
 
-    verdict = models.query_openrouter(judge_prompt)
-    print(f"VERDICT:\n{verdict}")
+    with tracing.span("judge"):
+        verdict, judge_ok = stream_response(models.route("debate_judge"), judge_prompt, "VERDICT:")
+
+    return {
+        "mode": "debate",
+        "ok": ok1 and ok2 and ok3 and ok4 and judge_ok,
+        "turns": {
+            "pro_opening": pro_arg, "con_opening": con_arg,
+            "pro_cross": pro_cross, "con_cross": con_cross,
+            "pro_rebuttal": pro_rebuttal, "con_rebuttal": con_rebuttal,
+            "pro_closing": pro_close, "con_closing": con_close,
+        },
+        "judge": verdict,
+    }
 
 
 # ==========================================
@@ -319,149 +288,147 @@ Decide the winner and give a 4–6 sentence justification.
 def mode_discussion(prompt):
     print("\n WELCOME TO THE UNIVERSAL CREATIVE ENGINE \n")
 
-    role1 = """
-You are the MASTER CREATOR.
-- Specializes in imaginative, high-level creativity across all domains:
-  • Stories, novels, short stories, scripts
-  • Songs, rap, melody, beats, lyrics
-  • Painting, visual concepts, composition, color palettes
-  • Research and fact-checked essays
-  • Captions, slogans, marketing content
-  • Product, invention, or design concepts
-  • Philosophical and conceptual writing
-  • Worldbuilding, lore, game or film ideas
-- Produce highly original, cinematic, emotionally and intellectually engaging content.
-- Think like the greatest human creators and innovators in history (Leonardo da Vinci, Tolkien, Rahman, Tesla, Picasso, Shakespeare, Steve Jobs, Hans Zimmer, etc.)
-"""
-
-    role2 = """
-You are the TECHNICAL CRAFTSMAN.
-- Convert raw concepts into structured, professional outputs:
-  • Songs: Verse, Chorus, Bridge, BPM, flow, rhyme scheme
-  • Rap: Punchlines, flow, rhyme, rhythm
-  • Story/Book: Chapters, characters, arcs, pacing, dialogue
-  • Research: Fact-based expansion, references, citations
-  • Captions/Slogans: Concise, catchy, impactful
-  • Painting/Design: Style, composition, technique, mood
-  • Product/Invention: Features, use-case, specifications
-  • Game/Film: Plot, mechanics, scenes, immersion
-- Ensure clarity, coherence, rhythm, professional-level output.
-"""
-
-    role3 = """
-You are the POLISHING DIRECTOR.
-- Finalize and perfect the creative piece:
-  • Enhance emotional, intellectual, or aesthetic impact
-  • Strengthen weak points or unclear parts
-  • Improve flow, pacing, or readability
-  • Make endings memorable, cinematic, or profound
-  • Ensure originality, coherence, and public-ready quality
-"""
-
     # -----------------------------
     # ROUND 1 — MASTER CREATOR 
     # -----------------------------
     print(" ROUND 1: HIGH-LEVEL CREATIVE CONCEPT (Gemini)\n")
-    r1_prompt = f"""
-{role1}
-
-Create an original concept based on:
-"{prompt}"
-
-Include:
-- Mood & tone
-- Style & format (story, novel, song, rap, painting, caption, slogan, research, book, essay, product concept)
-- Key visuals, motifs, or ideas
-- Themes or messages
-- Emotional or intellectual impact
-"""
-    r1 = models.query_gemini(r1_prompt)
-    print(f"🔵 Gemini (Concept Generation):\n{r1}\n")
+    r1_prompt = prompt_templates.render("discussion.creator", prompt=prompt)
+    with tracing.span("discussion.round", round=1):
+        r1, ok1 = stream_response(models.route("creator"), r1_prompt, "🔵 Gemini (Concept Generation):")
 
     # -----------------------------
     # ROUND 2 — TECHNICAL CRAFTSMAN (Groq)
     # -----------------------------
     print(" ROUND 2: STRUCTURED CREATIVE EXPANSION (Groq)\n")
-    r2_prompt = f"""
-{role2}
-
-Using this concept:
-\"\"\"{r1}\"\"\"
-
-Transform it into a fully developed creative piece:
-- Song/rap: full structure, melody, verses, chorus, flow, rhythm
-- Story/Book: chapters, characters, arcs, dialogue, pacing
-- Research: evidence-based expansion, examples, citations
-- Caption/Slogan: concise, catchy, memorable
-- Painting/Design: composition, style, lighting, mood
-- Product/Invention: features, innovation, usability
-- Game/Film: plot, scenes, immersive experience
-- Essay/Philosophical writing: structured argument, clarity, insight
-
-Choose the best format for this concept.
-Ensure the output is professional, coherent, and engaging.
-"""
-    r2 = models.query_groq(r2_prompt)
-    print(f"🟣 Groq (Technical Expansion):\n{r2}\n")
+    r2_prompt = prompt_templates.render("discussion.craftsman", concept=r1)
+    with tracing.span("discussion.round", round=2):
+        r2, ok2 = stream_response(models.route("craftsman"), r2_prompt, "🟣 Groq (Technical Expansion):")
 
     # -----------------------------
     # ROUND 3 — POLISHING DIRECTOR (OpenRouter)
     # -----------------------------
     print(" ROUND 3: FINAL POLISH & IMPACT (OpenRouter)\n")
-    r3_prompt = f"""
-{role3}
+    r3_prompt = prompt_templates.render("discussion.polisher", concept=r1, draft=r2)
+    with tracing.span("discussion.round", round=3):
+        r3, ok3 = stream_response(models.route("polisher"), r3_prompt, "🟢 OpenRouter (Final Masterpiece):")
 
-Here is the concept and structured draft:
-Concept:
-\"\"\"{r1}\"\"\"
+    print("\n UNIVERSAL CREATIVE WORK COMPLETE!\n")
 
-Draft:
-\"\"\"{r2}\"\"\"
+    return {
+        "mode": "discussion",
+        "ok": ok1 and ok2 and ok3,
+        "rounds": {"concept": r1, "draft": r2, "final": r3},
+        "judge": r3,
+    }
 
-Your job:
-- Strengthen weak points and unclear parts
-- Enhance emotional, intellectual, or aesthetic depth
-- Improve musicality, flow, pacing, or readability
-- Add cinematic, memorable, or profound endings
-- Ensure originality, coherence, and public-ready quality
 
-Produce the FINAL MASTERPIECE that could be published, performed, or presented publicly.
-"""
-    r3 = models.query_openrouter(r3_prompt)
-    print(f"🟢 OpenRouter (Final Masterpiece):\n{r3}\n")
+# ==========================================
+# FILE EDITS (patch first, full rewrite as fallback)
+# ==========================================
+def rewrite_file(file_path, current_content, task, role="You are a Senior Developer.", max_chars=None):
+    """Ask the fixer (OpenRouter by default) for the complete new content of one file.
+
+    Raises models.ProviderError if no fixer answered, so the file is left as it is.
+    """
+    rewrite_prompt = f"""
+    {role}
+    {task}
+    File: {file_path}
+
+    Current Content:
+    {current_content[:max_chars] if max_chars else current_content}
+
+    Return ONLY the COMPLETE fixed code. No markdown, no explanations.
+    """
+    fixed_code, ok = models.query_role_checked("fixer", rewrite_prompt)
+    if not ok:
+        raise models.ProviderError(fixed_code)
+    return re.sub(r"```[\w]*|```", "", fixed_code).strip()
 
-    print("\n UNIVERSAL CREATIVE WORK COMPLETE!\n")
+
+def edit_file(file_path, current_content, task, role="You are a Senior Developer.", max_chars=None):
+    """Fix one file via search/replace edits applied locally. Returns (new_content, "patch" or "rewrite").
+
+    Small fixes come back as a few edit blocks instead of the whole file, which is far
+    fewer output tokens and can't truncate big files. If the edits don't apply cleanly,
+    the file is regenerated in full instead. Raises models.ProviderError like rewrite_file.
+    """
+    edit_prompt = f"""
+    {role}
+    {task}
+    File: {file_path}
+
+    Current Content:
+    {current_content[:max_chars] if max_chars else current_content}
+
+    {patching.EDIT_FORMAT_INSTRUCTIONS}
+    """
+    response, ok = models.query_role_checked("fixer", edit_prompt)
+    if not ok:
+        raise models.ProviderError(response)
+    new_content, _ = patching.apply_edits(current_content, response)
+    if new_content is not None:
+        return new_content, "patch"
+    return rewrite_file(file_path, current_content, task, role, max_chars), "rewrite"
 
 
 # ==========================================
 # QA & AUTO-FIX LOGIC
 # ==========================================
-def run_qa_loop(project_name, file_structure):
-    print("\n QA ENGINEER (Gemini) is reviewing the code...")
-    
-    for attempt in range(1, 4):
-        project_content = ""
-        for file_path in file_structure.keys():
-            full_path = os.path.join(project_name, file_path)
-            if os.path.exists(full_path) and os.path.isfile(full_path):
-                if any(full_path.endswith(ext) for ext in ['.png', '.jpg', '.jpeg', '.gif', '.ico', '.svg', '.mp4', '.woff', '.woff2', '.ttf']):
-                    continue
-                try:
-                    with open(full_path, "r") as f:
-                        content = f.read()
-                        project_content += f"\n--- FILE: {file_path} ---\n{content}\n"
-                except Exception:
-                    pass
-        
-        if not project_content:
-            print(" No text files found to review.")
-            return
-
-        print(f"\n QA Round {attempt}/3...")
-        
-        qa_prompt = f"""
+# Files with QA issues are fixed concurrently, at most this many at a time.
+FIX_WORKERS = 6
+
+# Token budget for one QA review call. Projects that don't fit are split into
+# up to QA_MAX_SHARDS batches reviewed in parallel, and their issues merged.
+QA_TOKEN_BUDGET = 12000
+QA_MAX_SHARDS = 6
+
+
+def fix_file_issues(project_name, target_file, bug_descs):
+    """Fix all QA issues in one file with a single rewrite. Returns a status message."""
+    full_path = os.path.join(project_name, target_file or "")
+    if not target_file or not os.path.isfile(full_path):
+        return f"File {target_file} not found."
+
+    with open(full_path, "r") as f:
+        current_content = f.read()
+
+    bug_list = "\n".join(f"{i}. {desc}" for i, desc in enumerate(bug_descs, 1))
+    with tracing.span("qa.fix", file=target_file, issues=len(bug_descs)):
+        fixed_code, how = edit_file(target_file, current_content, f"Fix ALL of these bugs identified by QA:\n{bug_list}")
+
+    with open(full_path, "w") as f:
+        f.write(fixed_code)
+
+    return "Fixed (patched)." if how == "patch" else "Fixed (rewritten)."
+
+
+# Passed to providers configured for schema-constrained output (structured_output "json_schema")
+QA_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "status": {"type": "string", "enum": ["PASS", "FAIL"]},
+        "issues": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"file": {"type": "string"}, "description": {"type": "string"}},
+                "required": ["file", "description"],
+            },
+        },
+    },
+    "required": ["status", "issues"],
+}
+
+
+def review_shard(project_content):
+    """Ask the QA engineer to review one packed batch of files. Returns (result or None, raw)."""
+    qa_prompt = f"""
         You are a Senior QA Engineer.
         Review the following project files for bugs, syntax errors, broken links, and logic issues.
+        Files not shown in full below are either unchanged since the last review or reviewed in a
+        separate batch; report issues only in the files shown in full, and use the file list to
+        check links and imports.
         
         CRITICAL CHECKS:
         1.  **Broken Links**: Does index.html link to the correct CSS/JS files? (e.g., href="style.css" vs href="src/style.css").
@@ -469,7 +436,7 @@ def run_qa_loop(project_name, file_structure):
         3.  **Syntax**: Are there any unclosed tags or syntax errors?
         
         Project Files:
-        {project_content[:50000]}
+        {project_content}
         
         Return ONLY a JSON object with this format:
         {{
@@ -479,62 +446,161 @@ def run_qa_loop(project_name, file_structure):
             ]
         }}
         """
-        qa_resp = models.query_gemini(qa_prompt)
-        
-        # Parse JSON
-        clean_json = re.sub(r"```json|```", "", qa_resp).strip()
-        try:
-            qa_result = json.loads(clean_json)
-        except json.JSONDecodeError:
-            print(f"⚠️ QA Parse Error. Raw: {qa_resp}")
-            break
-            
-        if qa_result.get("status") == "PASS":
-            print("✅ QA PASSED! No critical issues found.")
-            break
-            
-        issues = qa_result.get("issues", [])
-        if not issues:
-            print("✅ QA PASSED! (No issues listed)")
-            break
-            
-        print(f"❌ QA FAILED. Found {len(issues)} issues. Fixing...")
+    with tracing.span("qa.review", chars=len(project_content)):
+        return models.query_json("qa", qa_prompt, require=("status", "issues"), schema=QA_SCHEMA)
+
+
+def run_qa_loop(project_name, file_structure):
+    print("\n QA ENGINEER (Gemini) is reviewing the code...")
+
+    # Content hash of each file as of the last QA pass. Later passes only resend
+    # files whose hash changed; unchanged files are listed by name and size.
+    reviewed_hashes = {}
+    # Files left out of the last round for lack of budget; they go first next round
+    not_reviewed = []
+    
+    for attempt in range(1, 4):
+        with tracing.span("qa.attempt", attempt=attempt):
+            files = {}
+            for file_path in file_structure.keys():
+                full_path = os.path.join(project_name, file_path)
+                if os.path.exists(full_path) and os.path.isfile(full_path):
+                    if any(full_path.endswith(ext) for ext in ['.png', '.jpg', '.jpeg', '.gif', '.ico', '.svg', '.mp4', '.woff', '.woff2', '.ttf']):
+                        continue
+                    try:
+                        with open(full_path, "r") as f:
+                            files[file_path] = f.read()
+                    except Exception:
+                        pass
         
-        # Fix Loop
-        for issue in issues:
-            target_file = issue.get("file")
-            bug_desc = issue.get("description")
-            
-            print(f"  🛠️ Fixing {target_file}: {bug_desc}...")
+            if not files:
+                print(" No text files found to review.")
+                return
+
+            hashes = {path: hashlib.sha256(content.encode("utf-8")).hexdigest() for path, content in files.items()}
+            changed = [path for path in files if reviewed_hashes.get(path) != hashes[path]]
+            unchanged = [path for path in files if path not in changed]
+
+            if not changed:
+                print(f"\n QA Round {attempt}/3 skipped: no files changed since the last review.")
+                break
+
+            # Every shard carries the file list (by directory for large projects) so
+            # cross-file checks still work
+            file_list = project_packer.file_index(
+                files, int(QA_TOKEN_BUDGET * project_packer.HEADER_SHARE), unchanged=unchanged
+            )
+            # After the entry points: files skipped last round, then the newest ones
+            # (what was just written or fixed)
+            carried = [path for path in not_reviewed if path in changed]
+            recent = carried + sorted(
+                (path for path in changed if path not in carried),
+                key=lambda path: os.path.getmtime(os.path.join(project_name, path)),
+                reverse=True,
+            )
+            shards, omitted = project_packer.pack_project(
+                {path: files[path] for path in changed},
+                QA_TOKEN_BUDGET,
+                recent=recent,
+                header=file_list,
+                max_shards=QA_MAX_SHARDS,
+            )
+
+            detail = f"{len(changed)} changed, {len(unchanged)} unchanged files" if unchanged else f"{len(changed)} files"
+            if len(shards) > 1:
+                detail += f", {len(shards)} parallel review batches"
+            print(f"\n QA Round {attempt}/3 ({detail})...")
+            if omitted:
+                print(f"   ⚠️ {len(omitted)} files exceed the QA budget and were not reviewed this round.")
+            not_reviewed = omitted
+
+            with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+                reviews = list(pool.map(tracing.bind(lambda shard: review_shard(shard["text"])), shards))
+
+            issues = []
+            reviewed_paths = []
+            for shard, (qa_result, qa_resp) in zip(shards, reviews):
+                if qa_result is None:
+                    print(f"⚠️ QA Parse Error. Raw: {qa_resp}")
+                    continue
+                reviewed_paths.extend(shard["paths"])
+                if qa_result.get("status") != "PASS":
+                    issues.extend(qa_result.get("issues", []))
+
+            if not reviewed_paths:
+                break
+
+            # Unchanged files were already reviewed; files from unparseable shards are retried next round
+            reviewed_hashes.update({path: hashes[path] for path in unchanged + reviewed_paths})
+
+            # Shards may report the same cross-file issue twice
+            unique_issues = {}
+            for issue in issues:
+                # "index.html" and "./index.html" are one file: one group, one fix task
+                if isinstance(issue.get("file"), str):
+                    issue["file"] = os.path.normpath(issue["file"])
+                unique_issues.setdefault((issue.get("file"), issue.get("description")), issue)
+            issues = list(unique_issues.values())
+
+            if not issues and omitted:
+                print(f"✅ No issues in the reviewed files; reviewing the other {len(omitted)} next.")
+                continue
+            if not issues:
+                print("✅ QA PASSED! No critical issues found.")
+                break
             
-            full_path = os.path.join(project_name, target_file)
-            if os.path.exists(full_path):
-                with open(full_path, "r") as f:
-                    current_content = f.read()
-                
-                fix_prompt = f"""
-                You are a Senior Developer.
-                Fix this specific bug identified by QA: "{bug_desc}"
-                File: {target_file}
-                
-                Current Content:
-                {current_content}
-                
-                Return ONLY the COMPLETE fixed code. No markdown.
-                """
-                fixed_code = models.query_openrouter(fix_prompt)
-                clean_fixed_code = re.sub(r"```[\w]*|```", "", fixed_code).strip()
-                
-                with open(full_path, "w") as f:
-                    f.write(clean_fixed_code)
-                    
-                print(f"     -> Fixed.")
-            else:
-                print(f"     -> File {target_file} not found.")
+            # One fix request per file, carrying every issue QA found in it. Fixing
+            # issue-by-issue rewrote the same file repeatedly and could undo earlier fixes.
+            issues_by_file = {}
+            for issue in issues:
+                issues_by_file.setdefault(issue.get("file"), []).append(issue.get("description"))
+
+            print(f"❌ QA FAILED. Found {len(issues)} issues in {len(issues_by_file)} files. Fixing...")
+
+            with ThreadPoolExecutor(max_workers=max(1, min(FIX_WORKERS, len(issues_by_file)))) as pool:
+                futures = {
+                    pool.submit(tracing.bind(fix_file_issues), project_name, target_file, bug_descs): target_file
+                    for target_file, bug_descs in issues_by_file.items()
+                }
+                for future in as_completed(futures):
+                    target_file = futures[future]
+                    bug_descs = issues_by_file[target_file]
+                    print(f"  🛠️ {target_file} ({len(bug_descs)} issue{'s' if len(bug_descs) != 1 else ''}):")
+                    for bug_desc in bug_descs:
+                        print(f"     - {bug_desc}")
+                    try:
+                        print(f"     -> {future.result()}")
+                    except Exception as e:
+                        print(f"     -> Fix failed: {e}")
+
+    if not_reviewed:
+        print(f"⚠️ QA ran out of rounds before reviewing {len(not_reviewed)} files: {', '.join(not_reviewed[:10])}"
+              f"{' ...' if len(not_reviewed) > 10 else ''}")
 
 # ==========================================
 # RUNTIME VERIFICATION & FIX LOGIC
 # ==========================================
+def install_dependencies(project_name):
+    """Bring the project's dependencies up to date from the dependency cache.
+
+    Cheap when the manifests haven't changed, so it runs every round. Returns the
+    Python interpreter to run the project with (None: use the system python3).
+    """
+    python = None
+    for kind, prepare in (("node", dep_cache.prepare_node), ("python", dep_cache.prepare_python)):
+        with tracing.span("deps", kind=kind) as span:
+            deps = prepare(project_name)
+            span.set(state=deps["state"])
+        if deps["state"] == "installed":
+            print(f"   📦 Installed {kind} dependencies in {deps['seconds']:.1f}s (cached for next time).")
+        elif deps["state"] == "hit":
+            print(f"   📦 {kind.capitalize()} dependencies restored from cache in {deps['seconds']:.1f}s.")
+        elif deps["state"] == "failed":
+            print(f"   ⚠️ {kind.capitalize()} dependency install failed. Proceeding anyway... Error: {deps['error'][-500:]}")
+        python = deps.get("python") or python
+    return python
+
+
 def run_runtime_verification_loop(project_name):
     print("\n RUNTIME VERIFICATION (Running the code in terminal)...")
     
@@ -542,119 +608,229 @@ def run_runtime_verification_loop(project_name):
     is_node = os.path.exists(os.path.join(project_name, "package.json"))
     is_python = any(f.endswith(".py") for f in os.listdir(project_name))
     
-    start_cmd = []
-    
     if is_node:
         print("   -> Detected Node.js project.")
-        print("   📦 Installing dependencies (npm install)...")
-        try:
-            subprocess.run(["npm", "install"], cwd=project_name, check=True, capture_output=True, timeout=60)
-        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
-            print(f"   ⚠️ npm install failed/timed out. Proceeding anyway... Error: {e}")
-            
-        start_cmd = ["npm", "start"]
-        
     elif is_python:
         print("   -> Detected Python project.")
-        # Find main file (heuristic: main.py, app.py, or the first python file)
-        main_file = "main.py"
-        if not os.path.exists(os.path.join(project_name, main_file)):
-            py_files = [f for f in os.listdir(project_name) if f.endswith(".py")]
-            if py_files:
-                main_file = py_files[0]
-        
-        start_cmd = ["python3", main_file]
     else:
         print("   ⚠️ Unknown project type. Skipping runtime verification.")
         return
 
     # Runtime Fix Loop (Max 3 attempts)
     for attempt in range(1, 4):
-        print(f"\n🔄 Runtime Round {attempt}/3: Executing '{' '.join(start_cmd)}'...")
+        with tracing.span("runtime.round", attempt=attempt):
+            # Fixes may have changed package.json/requirements.txt
+            python = install_dependencies(project_name)
+            commands = app_runner.find_commands(project_name, python=python or "python3")
+            if not commands:
+                print("   ⚠️ No entry point or test command found. Skipping runtime verification.")
+                return
+            print(f"\n🔄 Runtime Round {attempt}/3: Running {', '.join(c['name'] for c in commands)}...")
         
-        try:
-            # Run the process
-            # We use a timeout of 10s. 
-            # If it exits with 0 within 10s -> Success (Script finished).
-            # If it times out -> Success (Server running).
-            # If it exits with != 0 -> Fail (Crash).
-            process = subprocess.Popen(
-                start_cmd, 
-                cwd=project_name, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE, 
-                text=True
-            )
-            
             try:
-                stdout, stderr = process.communicate(timeout=10)
-                ret_code = process.returncode
-            except subprocess.TimeoutExpired:
-                process.kill()
-                print("   ✅ App started and ran for 10s without crashing! (Likely a server)")
-                
-                # Check for URLs in output
-                output = (process.stdout.read() if process.stdout else "") + (process.stderr.read() if process.stderr else "")
-                urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', output)
-                if urls:
-                    print(f"\n   🚀 PREVIEW AVAILABLE AT: {urls[0]}")
-                    print(f"   (Open this link in your browser to see the app)")
-                
-                break
-                
-            if ret_code == 0:
-                print("   ✅ App finished successfully (Exit Code 0).")
-                break
+                # Every entry point and test command runs at once, each in its own copy
+                # of the project. Apps pass when they exit 0 or come up (ready/still
+                # running); tests pass when they exit 0.
+                results = app_runner.run_all(project_name, commands)
+                failed = [r for r in results if not r["ok"]]
+                tracing.current().set(commands=len(results), failed=len(failed))
+
+                for r in results:
+                    if not r["ok"]:
+                        detail = f"exit code {r['returncode']}" if r["returncode"] is not None else f"{r['status']} after {r['seconds']:.0f}s"
+                        print(f"   ❌ {r['name']}: {detail}")
+                    elif r["status"] == "ready":
+                        print(f"   ✅ {r['name']}: up after {r['seconds']:.1f}s (server ready).")
+                    elif r["status"] == "running":
+                        print(f"   ✅ {r['name']}: ran for {r['seconds']:.0f}s without crashing! (Likely a server)")
+                    else:
+                        print(f"   ✅ {r['name']}: finished successfully (Exit Code {r['returncode']}).")
+
+                if not failed:
+                    url = next((r["url"] for r in results if r["kind"] == "app" and r["url"]), None)
+                    if url:
+                        print(f"\n   🚀 PREVIEW AVAILABLE AT: {url}")
+                        print(f"   (Open this link in your browser to see the app)")
+                    break
             
-            # If we are here, it crashed
-            print(f"   ❌ Runtime Error (Exit Code {ret_code})")
-            error_log = (stderr + "\n" + stdout).strip()
-            print(f"    Error Log:\n{error_log[-1000:]}") # Last 1000 chars
+                # If we are here, something crashed or a test failed
+                failed_cmds = ", ".join(r["name"] for r in failed)
+                error_log = app_runner.failure_report(results)
+                print(f"    Error Log:\n{error_log[-1000:]}") # Last 1000 chars
             
-            # Fix it
-            print("   🛠️ Attempting to fix runtime error...")
+                # Fix it
+                print("   🛠️ Attempting to fix runtime error...")
             
-            fix_prompt = f"""
-            You are a Senior DevOps/Developer.
-            The application failed to run.
-            Command: {' '.join(start_cmd)}
-            Error Log:
-            {error_log[-2000:]}
-            
-            Analyze the error. It might be a missing dependency, a syntax error, or a configuration issue.
-            Identify the file that needs fixing and provide the FULL fixed content.
+                fix_prompt = f"""
+                You are a Senior DevOps/Developer.
+                The application failed to run.
+                Failed command(s): {failed_cmds}
+                Error Log:
+                {error_log[-4000:]}
             
-            Return ONLY a JSON object with this format:
-            {{
-                "file": "filename",
-                "code": "full fixed code"
-            }}
-            """
-            fix_resp = models.query_openrouter(fix_prompt)
+                Analyze the error. It might be a missing dependency, a syntax error, or a configuration issue.
+                Identify the file that needs fixing.
             
-            # Parse JSON
-            clean_json = re.sub(r"```json|```", "", fix_resp).strip()
-            try:
-                fix_data = json.loads(clean_json)
-                target_file = fix_data["file"]
-                fixed_code = fix_data["code"]
-                
-                full_path = os.path.join(project_name, target_file)
+                Return ONLY a JSON object in one of these formats:
+                - To change an existing file, give search/replace edits (preferred, keep them small):
+                {{
+                    "file": "filename",
+                    "edits": "<<<<<<< SEARCH\\nexact existing lines\\n=======\\nnew lines\\n>>>>>>> REPLACE"
+                }}
+                - To create a new file, give its full content:
+                {{
+                    "file": "filename",
+                    "code": "full file content"
+                }}
+                """
+                fix_data, fix_resp = models.query_json("fixer", fix_prompt, require=("file",))
+                if fix_data is None:
+                    print(f"   ⚠️ Failed to parse fix response. Raw: {fix_resp}")
+                    continue
+
+                try:
+                    target_file = fix_data["file"]
+                    full_path = os.path.join(project_name, target_file)
+                    how = "rewritten"
+
+                    if "edits" in fix_data and os.path.isfile(full_path):
+                        with open(full_path, "r") as f:
+                            current_content = f.read()
+                        fixed_code, _ = patching.apply_edits(current_content, fix_data["edits"])
+                        how = "patched"
+                        if fixed_code is None:
+                            # Edits didn't match the file; fall back to regenerating it
+                            fixed_code = rewrite_file(
+                                target_file, current_content,
+                                f"The application failed to run ({failed_cmds}). Fix this file.\nError Log:\n{error_log[-4000:]}",
+                                role="You are a Senior DevOps/Developer."
+                            )
+                            how = "rewritten"
+                    else:
+                        fixed_code = fix_data["code"]
                 
-                # Ensure directory exists if file is new
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    # Ensure directory exists if file is new
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
                 
-                with open(full_path, "w") as f:
-                    f.write(fixed_code)
+                    with open(full_path, "w") as f:
+                        f.write(fixed_code)
                     
-                print(f"   ✅ Updated {target_file} based on runtime error.")
+                    print(f"   ✅ Updated {target_file} based on runtime error ({how}).")
                 
-            except (json.JSONDecodeError, KeyError):
-                print(f"   ⚠️ Failed to parse fix response. Raw: {fix_resp}")
+                except KeyError:
+                    print(f"   ⚠️ Fix response has neither edits nor code. Raw: {fix_resp}")
+                except models.ProviderError as e:
+                    print(f"   ⚠️ Could not fix {target_file}: {e}")
                 
-        except Exception as e:
-            print(f"   ⚠️ Execution failed: {e}")
-            break
+            except Exception as e:
+                print(f"   ⚠️ Execution failed: {e}")
+                break
+
+# ==========================================
+# CODE GENERATION (one file per worker)
+# ==========================================
+# Files are generated concurrently; this bounds the in-flight codegen calls.
+CODEGEN_WORKERS = 6
+
+
+def generate_project_file(prompt, project_name, file_path, description):
+    """Generate, validate and write one project file. Returns the warnings to print.
+
+    Runs on a worker thread, so messages are collected and printed by the caller
+    in one block instead of interleaving with other files.
+    """
+    with tracing.span("codegen", file=file_path):
+        return _generate_project_file(prompt, project_name, file_path, description)
+
+
+def _generate_project_file(prompt, project_name, file_path, description):
+    log = []
+    full_path = os.path.join(project_name, file_path)
+
+    # Skip if it's just a directory entry (ends with / or no extension)
+    if file_path.endswith("/") or "." not in os.path.basename(file_path):
+        os.makedirs(full_path, exist_ok=True)
+        return log
+
+    # Create subdirectories if needed
+    dir_name = os.path.dirname(full_path)
+    if dir_name:
+        os.makedirs(dir_name, exist_ok=True)
+
+    # The rules are the static system part (see prompt_templates); only the file details change per call
+    code_prompt = prompt_templates.render("codegen", prompt=prompt, file_path=file_path, description=description)
+    # VALIDATION: Check if content is relevant (detect common off-topic patterns)
+    irrelevant_patterns = ["groq", "api example", "llama-3", "@groq/cli", "fetch('/api"]
+
+    def is_relevant(code):
+        return not any(pattern in code.lower() for pattern in irrelevant_patterns)
+
+    # The coder (Groq unless it's unhealthy) writes the file. If it is slower than usual
+    # (past its p90 latency) or its answer is off-topic, the next healthy coder races it
+    # and the first relevant answer wins. With only one healthy coder there is no race.
+    primary = models.route("coder")
+    backup = models.route("coder", exclude=(primary,))
+    if backup == primary:
+        backup = None
+    code, provider = models.query_hedged(code_prompt, primary, backup, validate=is_relevant)
+    tracing.current().set(provider=provider)
+    if provider != primary:
+        log.append(f"     ⚠️ {models.label(primary)} was slow or off-topic. Using {models.label(provider)}'s version...")
+
+    # Clean code (remove any markdown code blocks like ```html, ```python, etc.)
+    clean_code = re.sub(r"```[\w]*|```", "", code).strip()
+
+    # VALIDATION: Check for invalid import statements in HTML
+    if file_path.endswith(".html") and "import " in clean_code and "<script" in clean_code:
+        log.append(f"     ⚠️ Detected invalid import statements in HTML. Removing...")
+        # Remove lines with import statements inside script tags
+        lines = clean_code.split("\n")
+        clean_lines = [line for line in lines if not ("import " in line and "from " in line)]
+        clean_code = "\n".join(clean_lines)
+
+    # VALIDATION: Ensure Tailwind CDN is present if Tailwind classes are used
+    if file_path.endswith(".html"):
+        has_tailwind_classes = any(tw_class in clean_code for tw_class in ["class=\"flex", "class=\"grid", "class=\"bg-", "class=\"text-"])
+        has_tailwind_cdn = "cdn.tailwindcss.com" in clean_code
+
+        if has_tailwind_classes and not has_tailwind_cdn:
+            log.append(f"     ⚠️ Tailwind classes detected but CDN missing. Adding...")
+            # Add Tailwind CDN to head
+            if "</head>" in clean_code:
+                clean_code = clean_code.replace(
+                    "</head>",
+                    '    <script src="https://cdn.tailwindcss.com"></script>\n</head>'
+                )
+
+        # VALIDATION: Check for missing content in landing pages
+        is_landing_page = "landing" in prompt.lower() or "page" in prompt.lower() or "website" in prompt.lower()
+        if is_landing_page:
+            has_hero = any(keyword in clean_code.lower() for keyword in ["hero", "<h1", "headline"])
+            has_features = "feature" in clean_code.lower() or "product" in clean_code.lower()
+            file_size = len(clean_code)
+
+            if not has_hero or not has_features or file_size < 1500:
+                log.append(f"     ⚠️ Landing page appears incomplete (size: {file_size} chars). Retrying with OpenRouter...")
+                # Retry with more explicit prompt
+                system, user = code_prompt
+                enhanced_prompt = (system, user + "\n\nREMINDER: This is a LANDING PAGE. You MUST include: Hero section, Features section, About section, and Footer. Generate COMPLETE HTML, not a skeleton.")
+                code = models.query_role("fixer", enhanced_prompt)
+                clean_code = re.sub(r"```[\w]*|```", "", code).strip()
+
+    # PREVENT CODE LEAKAGE: Remove anything after </html>
+    if file_path.endswith(".html"):
+        if "</html>" in clean_code:
+            clean_code = clean_code.split("</html>")[0] + "</html>"
+
+    # Special handling for JSON files to prevent corruption
+    if file_path.endswith(".json"):
+        # Keep just the JSON value; if there is no valid one, write as is (QA might fix it)
+        clean_code = json_extract.document(clean_code) or clean_code
+
+    with open(full_path, "w") as f:
+        f.write(clean_code)
+
+    return log
 
 # ==========================================
 # MODE 4: TEAM CODING
@@ -675,32 +851,21 @@ def mode_team_coding(prompt, team_choice="1"):
         
         print(f"\n📂 Reading project from: {project_path}")
         
-        # Read all files in the project
-        project_files = {}
-        for root, dirs, files in os.walk(project_path):
-            # Skip node_modules, .git, etc.
-            dirs[:] = [d for d in dirs if d not in ['node_modules', '.git', '__pycache__', 'dist', 'build']]
-            
-            for file in files:
-                # Skip binary files
-                if file.endswith(('.png', '.jpg', '.jpeg', '.gif', '.ico', '.svg', '.mp4', '.woff', '.woff2', '.ttf')):
-                    continue
-                    
-                file_path = os.path.join(root, file)
-                rel_path = os.path.relpath(file_path, project_path)
-                
-                try:
-                    with open(file_path, 'r') as f:
-                        project_files[rel_path] = f.read()
-                except:
-                    pass
+        # Index the project (honours .gitignore, skips binaries and oversized files).
+        # Contents are read lazily, only for the files that get fixed.
+        load_stats = {}
+        project_files = project_loader.load_index(project_path, stats=load_stats)
         
         print(f"✅ Found {len(project_files)} files to analyze")
+        skipped = load_stats["binary"] + load_stats["asset"] + load_stats["too_large"] + load_stats["over_budget"]
+        if skipped:
+            print(f"   (skipped {load_stats['binary']} binary, {load_stats['asset']} asset/generated, "
+                  f"{load_stats['too_large']} oversized and {load_stats['over_budget']} over-budget files)")
         
         # Analyze the project
         print("\n🔍 ARCHITECT (Gemini) is analyzing the project...")
         
-        files_summary = "\n".join([f"- {path} ({len(content)} chars)" for path, content in list(project_files.items())[:20]])
+        files_summary = "\n".join([f"- {path} ({entry.size} bytes, {entry.language})" for path, entry in list(project_files.items())[:20]])
         
         analysis_prompt = f"""
         You are a Senior Software Architect analyzing an existing project.
@@ -725,17 +890,16 @@ def mode_team_coding(prompt, team_choice="1"):
         }}
         """
         
-        analysis = models.query_gemini(analysis_prompt)
-        clean_json = re.sub(r"```json|```", "", analysis).strip()
+        with tracing.span("architect"):
+            analysis_data, _ = models.query_json("architect", analysis_prompt)
         
-        try:
-            analysis_data = json.loads(clean_json)
+        if analysis_data is not None:
             print(f"\n📊 Project Type: {analysis_data.get('project_type', 'Unknown')}")
             print(f"🐛 Issues Found: {len(analysis_data.get('issues', []))}")
             
             for issue in analysis_data.get('issues', [])[:5]:
                 print(f"   - {issue}")
-        except:
+        else:
             print(f"⚠️ Could not parse analysis. Proceeding with full project fix...")
             analysis_data = {"files_to_fix": list(project_files.keys())}
         
@@ -750,23 +914,19 @@ def mode_team_coding(prompt, team_choice="1"):
                 
             print(f"  - Fixing {file_path}...")
             
-            current_content = project_files[file_path]
-            
-            fix_prompt = f"""
-            You are a Senior Developer fixing issues in an existing project.
-            
-            User Request: "{prompt}"
-            File: {file_path}
-            
-            Current Content:
-            {current_content[:5000]}
+            current_content = project_loader.read_text(project_files[file_path])
             
-            Fix all issues, bugs, and improve the code quality.
-            Return ONLY the COMPLETE fixed code. No markdown, no explanations.
-            """
-            
-            fixed_code = models.query_openrouter(fix_prompt)
-            clean_fixed = re.sub(r"```[\w]*|```", "", fixed_code).strip()
+            try:
+                clean_fixed, how = edit_file(
+                    file_path, current_content,
+                    f'User Request: "{prompt}"\nFix all issues, bugs, and improve the code quality.',
+                    role="You are a Senior Developer fixing issues in an existing project.",
+                    max_chars=5000
+                )
+            except models.ProviderError as e:
+                print(f"    -> ⚠️ not fixed: {e}")
+                continue
+            print(f"    -> {'patched' if how == 'patch' else 'rewritten'}")
             
             # Write the fixed file
             full_path = os.path.join(project_path, file_path)
@@ -821,143 +981,34 @@ def mode_team_coding(prompt, team_choice="1"):
         "app.js": "// Optional JS"
     }}
     """
-    structure_json = models.query_gemini(arch_prompt)
-    
-    # Clean and parse JSON
-    clean_json = re.sub(r"```json|```", "", structure_json).strip()
-    try:
-        file_structure = json.loads(clean_json)
-    except json.JSONDecodeError:
+    with tracing.span("architect"):
+        file_structure, structure_json = models.query_json("architect", arch_prompt)
+    if file_structure is None:
         print(f"⚠️ Failed to parse architecture JSON. Raw output:\n{structure_json}")
         return
 
     # 2. SCAFFOLDER & CODER (Groq)
     print("\n  SCAFFOLDER & CODER (Groq) are building the project...")
     
-    for file_path, description in file_structure.items():
-        full_path = os.path.join(project_name, file_path)
-        
-        # Create subdirectories if needed
-        dir_name = os.path.dirname(full_path)
-        if dir_name:
-            os.makedirs(dir_name, exist_ok=True)
-        
-        print(f"  - Generating {file_path}...")
-        
-        code_prompt = f"""
-        You are a Senior Full Stack Developer (Top 1% Talent).
-        
-        PROJECT CONTEXT: {prompt}
-        FILE TO CREATE: {file_path}
-        FILE PURPOSE: {description}
-        
-        YOUR TASK: Write the COMPLETE, PRODUCTION-READY code for "{file_path}" that is part of the project: "{prompt}".
-        
-        CRITICAL RULES:
-        1.  **STAY ON TOPIC**: The code MUST be relevant to "{prompt}". DO NOT write examples about APIs, Groq, or unrelated topics.
-        2.  **COMPLETENESS - NO SKELETONS**: 
-            - For HTML landing pages, you MUST include ALL sections:
-              * Hero section with headline, description, and CTA button
-              * Features/Products section with at least 3 items
-              * About/Benefits section
-              * Testimonials or social proof (optional but recommended)
-              * Contact/CTA section
-              * Footer
-            - DO NOT generate skeleton HTML with just header/footer
-            - Each section must have REAL content, not placeholders
-        3.  **IMAGES**: NEVER use local paths. ALWAYS USE: `https://placehold.co/600x400?text=YourText`
-        4.  **Robustness**: Handle errors, add comments, use semantic HTML/Python type hinting.
-        5.  **No TODOs**: Do not leave "TODO" or "Rest of code here". Write it all.
-        6.  **Modern UI (Lovable/Cursor/v0 Style)**: 
-            - **MUST USE TAILWIND CSS**: Add `<script src="https://cdn.tailwindcss.com"></script>` in HTML <head>
-            - Use **VIBRANT COLORS**: Not gray/white. Use blues, purples, gradients (e.g., `bg-gradient-to-r from-blue-500 to-purple-600`)
-            - Use **Google Fonts**: Add Inter or Playfair Display
-            - Use **PREMIUM EFFECTS**: backdrop-blur, shadow-2xl, rounded-2xl, hover effects
-            - **GENEROUS WHITESPACE**: py-20, px-8, space-y-8
-            - **MODERN LAYOUT**: Use flexbox/grid, full-screen hero sections
-        7.  **NO INVALID SYNTAX**: 
-            - Do NOT use `import` statements in HTML <script> tags
-            - Do NOT use JSX or React syntax unless this is explicitly a React project
-        8.  **Single File ONLY**: Return ONLY the content for "{file_path}". Do NOT include other files.
-        9.  **Connectivity**: If this is HTML, link CSS/JS files correctly (e.g., `<link rel="stylesheet" href="style.css">`).
-        
-        Return ONLY the code for {file_path}. No explanations, no markdown blocks.
-        """
-        code = models.query_groq(code_prompt)
-        
-        # Clean code (remove any markdown code blocks like ```html, ```python, etc.)
-        clean_code = re.sub(r"```[\w]*|```", "", code).strip()
-        
-        # VALIDATION: Check if content is relevant (detect common off-topic patterns)
-        irrelevant_patterns = ["groq", "api example", "llama-3", "@groq/cli", "fetch('/api"]
-        is_irrelevant = any(pattern in clean_code.lower() for pattern in irrelevant_patterns)
-        
-        if is_irrelevant:
-            print(f"     ⚠️ Detected irrelevant content. Retrying with OpenRouter...")
-            # Retry with OpenRouter (more reliable)
-            code = models.query_openrouter(code_prompt)
-            clean_code = re.sub(r"```[\w]*|```", "", code).strip()
-        
-        # VALIDATION: Check for invalid import statements in HTML
-        if file_path.endswith(".html") and "import " in clean_code and "<script" in clean_code:
-            print(f"     ⚠️ Detected invalid import statements in HTML. Removing...")
-            # Remove lines with import statements inside script tags
-            lines = clean_code.split("\n")
-            clean_lines = [line for line in lines if not ("import " in line and "from " in line)]
-            clean_code = "\n".join(clean_lines)
-        
-        # VALIDATION: Ensure Tailwind CDN is present if Tailwind classes are used
-        if file_path.endswith(".html"):
-            has_tailwind_classes = any(tw_class in clean_code for tw_class in ["class=\"flex", "class=\"grid", "class=\"bg-", "class=\"text-"])
-            has_tailwind_cdn = "cdn.tailwindcss.com" in clean_code
-            
-            if has_tailwind_classes and not has_tailwind_cdn:
-                print(f"     ⚠️ Tailwind classes detected but CDN missing. Adding...")
-                # Add Tailwind CDN to head
-                if "</head>" in clean_code:
-                    clean_code = clean_code.replace(
-                        "</head>",
-                        '    <script src="https://cdn.tailwindcss.com"></script>\n</head>'
-                    )
-            
-            # VALIDATION: Check for missing content in landing pages
-            is_landing_page = "landing" in prompt.lower() or "page" in prompt.lower() or "website" in prompt.lower()
-            if is_landing_page:
-                has_hero = any(keyword in clean_code.lower() for keyword in ["hero", "<h1", "headline"])
-                has_features = "feature" in clean_code.lower() or "product" in clean_code.lower()
-                file_size = len(clean_code)
-                
-                if not has_hero or not has_features or file_size < 1500:
-                    print(f"     ⚠️ Landing page appears incomplete (size: {file_size} chars). Retrying with OpenRouter...")
-                    # Retry with more explicit prompt
-                    enhanced_prompt = code_prompt + "\n\nREMINDER: This is a LANDING PAGE. You MUST include: Hero section, Features section, About section, and Footer. Generate COMPLETE HTML, not a skeleton."
-                    code = models.query_openrouter(enhanced_prompt)
-                    clean_code = re.sub(r"```[\w]*|```", "", code).strip()
-        
-        # PREVENT CODE LEAKAGE: Remove anything after </html>
-        if file_path.endswith(".html"):
-            if "</html>" in clean_code:
-                clean_code = clean_code.split("</html>")[0] + "</html>"
-        
-        # Special handling for JSON files to prevent corruption
-        if file_path.endswith(".json"):
+    jobs = list(file_structure.items())
+    workers = max(1, min(CODEGEN_WORKERS, len(jobs)))
+    print(f"  - Generating {len(jobs)} files ({workers} at a time)...")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(tracing.bind(generate_project_file), prompt, project_name, file_path, description): file_path
+            for file_path, description in jobs
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            file_path = futures[future]
             try:
-                # Try to find the first valid JSON block
-                json_match = re.search(r"\{.*\}", clean_code, re.DOTALL)
-                if json_match:
-                    potential_json = json_match.group(0)
-                    json.loads(potential_json) # Validate
-                    clean_code = potential_json
-            except:
-                pass # If validation fails, write as is (QA might fix it)
-        
-        # Skip if it's just a directory entry (ends with / or no extension)
-        if file_path.endswith("/") or "." not in os.path.basename(file_path):
-            os.makedirs(full_path, exist_ok=True)
-            continue
-            
-        with open(full_path, "w") as f:
-            f.write(clean_code)
+                log = future.result()
+                print(f"  [{done}/{len(jobs)}] ✅ {file_path}")
+            except Exception as e:
+                log = [f"     ⚠️ Generation failed: {e}"]
+                print(f"  [{done}/{len(jobs)}] ❌ {file_path}")
+            for line in log:
+                print(line)
             
     print(f"\n✅ Project '{project_name}' built successfully!")
     
@@ -990,23 +1041,20 @@ def mode_team_coding(prompt, team_choice="1"):
                 
                 print(f"\n🐞 DEBUGGER (OpenRouter) is analyzing {target_file}...")
                 
-                debug_prompt = f"""
-                You are a Senior Developer with 20+ years of experience.
-                User Request: "{user_input}"
-                
-                Current File Content ({target_file}):
-                {current_content}
-                
-                Return the COMPLETE fixed code for this file.
-                Return ONLY the code. No markdown.
-                """
-                fixed_code = models.query_openrouter(debug_prompt)
-                clean_fixed_code = re.sub(r"```[\w]*|```", "", fixed_code).strip()
+                try:
+                    clean_fixed_code, how = edit_file(
+                        target_file, current_content,
+                        f'User Request: "{user_input}"',
+                        role="You are a Senior Developer with 20+ years of experience."
+                    )
+                except models.ProviderError as e:
+                    print(f"⚠️ {target_file} was left unchanged: {e}")
+                    continue
                 
                 with open(full_path, "w") as f:
                     f.write(clean_fixed_code)
                     
-                print(f"✅ Updated {target_file}")
+                print(f"✅ Updated {target_file} ({'patched' if how == 'patch' else 'rewritten'})")
             else:
                 print(f"⚠️ File {target_file} not found locally.")
         else:
@@ -1017,39 +1065,64 @@ def mode_team_coding(prompt, team_choice="1"):
 # ==========================================
 def mode_voting(prompt):
     print("\n  Collecting responses for voting...\n")
-    r1 = models.query_gemini(prompt)
-    r2 = models.query_groq(prompt)
-    r3 = models.query_openrouter(prompt)
+    panel = models.panel()
+    with tracing.span("fanout"):
+        results = models.query_all(prompt, providers=panel, on_result=print_received)
+    # Map keys to responses to show the winner's answer
+    responses = {name: judge_input(results[name]) for name in panel}
+    score_format = ", ".join(f'"{name}": <int>' for name in panel)
+    answers = "\n    ".join(
+        f"Answer {i} ({models.label(name)}): {responses[name][:1000]}..."
+        for i, name in enumerate(panel, 1)
+    )
     
     print("  Judge is scoring the answers...\n")
     
     score_prompt = f"""
-    Analyze these 3 answers.
+    Analyze these {len(panel)} answers.
     1. Rate them 0-10 based on accuracy and helpfulness.
-    2. Write a single paragraph "Judge's Perspective" that synthesizes the best insights from all three answers into a final conclusion.
+    2. Write a single paragraph "Judge's Perspective" that synthesizes the best insights from all the answers into a final conclusion.
 
     Return ONLY a JSON object with this exact format:
     {{
-        "scores": {{"gemini": <int>, "groq": <int>, "openrouter": <int>}},
+        "scores": {{{score_format}}},
         "judge_perspective": "<single paragraph synthesis of the topic based on all answers>"
     }}
     
     Prompt: {prompt}
     
-    Answer 1 (Gemini): {r1[:1000]}...
-    Answer 2 (Groq): {r2[:1000]}...
-    Answer 3 (OpenRouter): {r3[:1000]}...
+    {answers}
     """
-    scores_json = models.query_gemini(score_prompt)
-    
-    import json
-    import re
+    score_schema = {
+        "type": "object",
+        "properties": {
+            "scores": {
+                "type": "object",
+                "properties": {name: {"type": "integer"} for name in panel},
+                "required": list(panel),
+            },
+            "judge_perspective": {"type": "string"},
+        },
+        "required": ["scores", "judge_perspective"],
+    }
+    judge_start = time.perf_counter()
+    with tracing.span("judge"):
+        data, scores_json = models.query_json("judge", score_prompt, require=("scores", "judge_perspective"), schema=score_schema)
+    judge_latency = time.perf_counter() - judge_start
+
+    result = {
+        "mode": "voting",
+        "ok": data is not None and any(result["ok"] for result in results.values()),
+        "responses": results,
+        "judge": scores_json,
+        "timings": {"judge": judge_latency},
+    }
+
+    if data is None:
+        print(f"\n⚠️ Could not parse judge output. Raw output:\n{scores_json}")
+        return result
 
-    # Clean up the response (remove markdown code blocks if present)
-    clean_json = re.sub(r"```json|```", "", scores_json).strip()
-    
     try:
-        data = json.loads(clean_json)
         scores = data["scores"]
         perspective = data["judge_perspective"]
         
@@ -1057,23 +1130,34 @@ def mode_voting(prompt):
         winner_key = max(scores, key=scores.get)
         print(f"\n🏆 WINNER: {winner_key.upper()} (Score: {scores[winner_key]}/10)")
         
-        # Map keys to responses to show the winner's answer
-        responses = {
-            "gemini": r1,
-            "groq": r2,
-            "openrouter": r3
-        }
-        
         print(f"\n  {winner_key.upper()}'S ANSWER:\n{strip_markdown(responses.get(winner_key, 'Error retrieving answer'))}")
         
         print(f"\n JUDGE'S PERSPECTIVE:\n{strip_markdown(perspective)}")
+
+        result.update({"scores": scores, "winner": winner_key, "judge": perspective})
         
-    except (json.JSONDecodeError, KeyError) as e:
+    except (KeyError, TypeError, ValueError) as e:
         print(f"\n⚠️ Could not parse judge output. Raw output:\n{scores_json}\nError: {e}")
 
+    return result
+
 # ==========================================
 # MAIN MENU
 # ==========================================
+def run_traced(name, mode_fn, *args):
+    """Run a mode under a trace span and print where its time went"""
+    since = tracing.mark()
+    try:
+        with tracing.span(f"mode.{name}"):
+            return mode_fn(*args)
+    finally:
+        print("\n📊 TRACE SUMMARY\n")
+        print(tracing.summary(since))
+        paths = tracing.save(name, since)
+        if paths:
+            print(f"\n   Trace written to {paths[0]} (Chrome/Perfetto: {paths[1]})")
+
+
 def main():
     while True:
         print("\n=================================")
@@ -1103,18 +1187,18 @@ def main():
             else:
                 prompt = input("Describe your project (e.g., 'Create a luxury watch landing page'): ")
             
-            mode_team_coding(prompt, team_choice)
+            run_traced("team_coding", mode_team_coding, prompt, team_choice)
         else:
             prompt = input("Enter your topic/problem: ")
             
             if choice == '1':
-                mode_consensus(prompt)
+                run_traced("consensus", mode_consensus, prompt)
             elif choice == '2':
-                mode_debate(prompt)
+                run_traced("debate", mode_debate, prompt)
             elif choice == '3':
-                mode_discussion(prompt)
+                run_traced("discussion", mode_discussion, prompt)
             elif choice == '5':
-                mode_voting(prompt)
+                run_traced("voting", mode_voting, prompt)
             else:
                 print("Invalid choice!")
             